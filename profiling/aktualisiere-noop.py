@@ -3,17 +3,24 @@ from pathlib import Path
 import ijson
 import typer
 
-from mtv_cli.content_retrieval import extract_entries_from_filmliste, get_lzma_fp
+from mtv_cli.content_retrieval import (
+    FilmlistParser,
+    extract_entries_from_filmliste,
+    get_lzma_fp,
+    iter_raw_entries,
+)
 from mtv_cli.storage_backend import NoopDatabase
 
 app = typer.Typer()
 
 
 @app.command()
-def insert_to_noop_db(filmliste: Path) -> None:
+def insert_to_noop_db(
+    filmliste: Path, parser: FilmlistParser = FilmlistParser.RECORDS
+) -> None:
     database = NoopDatabase()
     unzipped = get_lzma_fp(filmliste)
-    all_movies = extract_entries_from_filmliste(unzipped)
+    all_movies = extract_entries_from_filmliste(unzipped, parser)
     database.insert_movies(all_movies)
 
 
@@ -32,5 +39,14 @@ def unpack_and_ijson(filmliste: Path) -> None:
         pass
 
 
+@app.command()
+def unpack_and_split_entries(
+    filmliste: Path, parser: FilmlistParser = FilmlistParser.RECORDS
+) -> None:
+    unzipped = get_lzma_fp(filmliste)
+    for entry in iter_raw_entries(unzipped, parser):
+        pass
+
+
 if __name__ == "__main__":
     app()
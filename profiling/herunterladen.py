@@ -0,0 +1,298 @@
+import datetime as dt
+import multiprocessing as mp
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+import typer
+from loguru import logger
+
+from mtv_cli.content_retrieval import LowMemoryFileSystemDownloader, create_session
+from mtv_cli.film import MovieListItem, MovieQuality
+from mtv_cli.parallel_download import download_parallel
+
+app = typer.Typer()
+
+# Inhalt aller Filme, wiederholt bis zur gewünschten Größe
+BLOCK = bytes(range(256)) * 4096
+WRITE_SIZE = 64 * 1024
+
+
+@dataclass
+class ServerSettings:
+    size: int
+    latency_s: float
+    bandwidth: Optional[int]
+    ranges: bool
+    cut_rate: float
+    error_rate: float
+    seed: int
+
+
+class SyntheticFilmServer(ThreadingHTTPServer):
+    """Lokaler Ersatz für die Server der Mediatheken"""
+
+    daemon_threads = True
+
+    def __init__(self, settings: ServerSettings) -> None:
+        super().__init__(("127.0.0.1", 0), SyntheticFilmHandler)
+        self.settings = settings
+        self.rng = random.Random(settings.seed)
+        self.lock = threading.Lock()
+        self.bytes_sent = 0
+
+    def draw_failure(self) -> tuple[bool, Optional[float]]:
+        """Ob die Antwort ein 503 wird und nach welchem Anteil sie abbricht"""
+        with self.lock:
+            is_error = self.rng.random() < self.settings.error_rate
+            cut_at = (
+                self.rng.random()
+                if self.rng.random() < self.settings.cut_rate
+                else None
+            )
+        return is_error, cut_at
+
+    def handle_error(self, request, client_address) -> None:
+        # Abgebrochene Verbindungen sind hier gewollt oder eine Folge davon.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class SyntheticFilmHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: SyntheticFilmServer
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_HEAD(self) -> None:
+        self.respond(with_body=False)
+
+    def do_GET(self) -> None:
+        self.respond(with_body=True)
+
+    def respond(self, with_body: bool) -> None:
+        settings = self.server.settings
+        time.sleep(settings.latency_s)
+        is_error, cut_at = self.server.draw_failure()
+        if is_error:
+            self.send_empty(503)
+            return
+
+        etag = f'"synthetisch-{settings.size}"'
+        start, end = self.get_range(etag)
+        if start > end:
+            self.send_empty(416, {"Content-Range": f"bytes */{settings.size}"})
+            return
+        if end - start + 1 < settings.size:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{settings.size}")
+        else:
+            self.send_response(200)
+        if settings.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if with_body:
+            self.send_body(start, end + 1, cut_at)
+
+    def get_range(self, etag: str) -> tuple[int, int]:
+        """Angefragter Bereich mit inklusivem Ende, sonst die ganze Datei"""
+        settings = self.server.settings
+        byte_range = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if not settings.ranges or not byte_range or if_range not in (None, etag):
+            return 0, settings.size - 1
+        first, _, last = byte_range.removeprefix("bytes=").partition("-")
+        end = min(int(last), settings.size - 1) if last else settings.size - 1
+        return int(first), end
+
+    def send_empty(self, status: int, headers: Optional[dict[str, str]] = None) -> None:
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_body(self, start: int, stop: int, cut_at: Optional[float]) -> None:
+        if cut_at is not None:
+            stop = start + int(cut_at * (stop - start))
+            self.close_connection = True
+        began = time.monotonic()
+        position = start
+        try:
+            while position < stop:
+                offset = position % len(BLOCK)
+                offset_end = offset + min(WRITE_SIZE, stop - position)
+                self.wfile.write(BLOCK[offset:offset_end])
+                position += offset_end - offset
+                with self.server.lock:
+                    self.server.bytes_sent += offset_end - offset
+                self.throttle(position - start, began)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def throttle(self, n_sent: int, began: float) -> None:
+        """Warten, bis `n_sent` Bytes zur Bandbreite der Verbindung passen"""
+        bandwidth = self.server.settings.bandwidth
+        if bandwidth is not None:
+            ahead_s = n_sent / bandwidth - (time.monotonic() - began)
+            time.sleep(max(ahead_s, 0))
+
+
+def synthetic_films(port: int, n_films: int) -> list[MovieListItem]:
+    # Zwei Hostnamen, damit die Begrenzung je Server greift
+    hosts = ["127.0.0.1", "localhost"]
+    return [
+        MovieListItem(
+            sender="Sender",
+            thema="Thema",
+            titel=f"Film {n}",
+            datum=dt.date(2022, 1, 1),
+            zeit=dt.time(20, 15),
+            dauer=dt.timedelta(minutes=90),
+            groesse=0,
+            beschreibung="",
+            url=f"http://{hosts[n % len(hosts)]}:{port}/film{n}.mp4",
+            website="",
+            url_untertitel="",
+            url_rtmp="",
+            url_klein="",
+            url_rtmp_klein="",
+            url_hd="",
+            url_rtmp_hd="",
+            datuml=0,
+            url_history="",
+            geo="",
+            neu=False,
+        )
+        for n in range(n_films)
+    ]
+
+
+def is_intact(path: Path, size: int) -> bool:
+    if path.stat().st_size != size:
+        return False
+    with path.open("rb") as fh:
+        while block := fh.read(len(BLOCK)):
+            if block != BLOCK[: len(block)]:
+                return False
+    return True
+
+
+def measure(
+    films: list[MovieListItem],
+    size: int,
+    chunk_size: int,
+    n_transfers: int,
+    segments: int,
+) -> dict[str, float]:
+    """Einen Durchlauf messen, in einem eigenen Prozess für saubere RSS-Werte"""
+    # Eingestreute Fehler sollen die Tabelle nicht mit Tracebacks überdecken.
+    logger.disable("mtv_cli")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        retriever = LowMemoryFileSystemDownloader(
+            root=Path(tmpdir),
+            quality=MovieQuality.SD,
+            chunk_size=chunk_size,
+            segments=segments,
+            session=create_session(pool_size=n_transfers * segments),
+        )
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        results = download_parallel(retriever, films, n_transfers, n_transfers)
+        failed = [film for film, ok in results if not ok]
+        # Zweiter Durchgang wie beim nächsten Aufruf von vormerkungen-herunterladen
+        results = download_parallel(retriever, failed, n_transfers, n_transfers)
+        failed_again = [film for film, ok in results if not ok]
+        duration = time.perf_counter() - start
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+        n_broken = sum(
+            not is_intact(retriever.get_filename(film), size)
+            for film in films
+            if film not in failed_again
+        )
+    cpu_s = (usage_after.ru_utime - usage_before.ru_utime) + (
+        usage_after.ru_stime - usage_before.ru_stime
+    )
+    return {
+        "duration": duration,
+        "cpu_s": cpu_s,
+        "max_rss_kib": usage_after.ru_maxrss,
+        "n_failed": len(failed),
+        "n_failed_again": len(failed_again),
+        "n_broken": n_broken,
+    }
+
+
+@app.command()
+def compare(
+    n_films: int = 8,
+    size_mib: int = 64,
+    chunk_kib: list[int] = typer.Option([64, 1024]),
+    transfers: list[int] = typer.Option([1, 4]),
+    segments: int = 1,
+    latency_ms: float = 20.0,
+    bandwidth_mib: Optional[float] = typer.Option(
+        None, help="Datenrate je Verbindung, ohne Angabe unbegrenzt"
+    ),
+    ranges: bool = True,
+    cut_rate: float = typer.Option(0.0, help="Anteil abgebrochener Antworten"),
+    error_rate: float = typer.Option(0.0, help="Anteil von Antworten mit 503"),
+    seed: int = 0,
+) -> None:
+    """Durchsatz, CPU-Zeit und Speicherbedarf von Downloads vergleichen"""
+    size = size_mib * 2**20
+    bandwidth = None if bandwidth_mib is None else int(bandwidth_mib * 2**20)
+    settings = ServerSettings(
+        size=size,
+        latency_s=latency_ms / 1000,
+        bandwidth=bandwidth,
+        ranges=ranges,
+        cut_rate=cut_rate,
+        error_rate=error_rate,
+        seed=seed,
+    )
+    print(
+        f"{n_films} Filme à {size_mib} MiB, Latenz {latency_ms} ms,"
+        f" Segmente {segments}, Range {'ja' if ranges else 'nein'}"
+    )
+    print(
+        f"{'Chunk KiB':>9} {'Parallel':>8} {'MiB/s':>8} {'CPU s/GiB':>9}"
+        f" {'RSS MiB':>8} {'Fehler':>6} {'dauerhaft':>9} {'defekt':>6}"
+        f" {'übertragen/Nutzlast':>19}"
+    )
+    for chunk in chunk_kib:
+        for n_transfers in transfers:
+            server = SyntheticFilmServer(settings)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            films = synthetic_films(server.server_address[1], n_films)
+            with ProcessPoolExecutor(1, mp_context=mp.get_context("spawn")) as pool:
+                result = pool.submit(
+                    measure, films, size, chunk * 1024, n_transfers, segments
+                ).result()
+            server.shutdown()
+            server.server_close()
+
+            payload = n_films * size
+            print(
+                f"{chunk:>9} {n_transfers:>8}"
+                f" {payload / 2**20 / result['duration']:>8.1f}"
+                f" {result['cpu_s'] / (payload / 2**30):>9.2f}"
+                f" {result['max_rss_kib'] / 1024:>8.1f}"
+                f" {result['n_failed']:>6} {result['n_failed_again']:>9}"
+                f" {result['n_broken']:>6} {server.bytes_sent / payload:>19.2f}"
+            )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,82 @@
+import datetime as dt
+import time
+from pathlib import Path
+from typing import Callable
+
+import typer
+
+from mtv_cli.content_retrieval import FilmlistParser, get_lzma_fp, iter_raw_entries
+from mtv_cli.film import parse_datum, parse_dauer, parse_zeit
+
+app = typer.Typer()
+
+RawFields = list[tuple[str, str, str]]
+
+
+def parse_with_strptime(fields: RawFields) -> None:
+    for datum, zeit, dauer in fields:
+        if datum:
+            dt.datetime.strptime(datum, "%d.%m.%Y").date()
+        if zeit:
+            dt.datetime.strptime(zeit, "%H:%M:%S").time()
+        if dauer:
+            dt.datetime.strptime(dauer, "%H:%M:%S") - dt.datetime(1900, 1, 1)
+
+
+def parse_fixed_format(fields: RawFields) -> None:
+    for datum, zeit, dauer in fields:
+        if datum:
+            parse_datum(datum)
+        if zeit:
+            parse_zeit(zeit)
+        if dauer:
+            parse_dauer(dauer)
+
+
+def assert_same_results(fields: RawFields) -> None:
+    for datum, zeit, dauer in fields:
+        if datum:
+            assert parse_datum(datum) == dt.datetime.strptime(datum, "%d.%m.%Y").date()
+        if zeit:
+            assert parse_zeit(zeit) == dt.datetime.strptime(zeit, "%H:%M:%S").time()
+        if dauer:
+            parsed = dt.datetime.strptime(dauer, "%H:%M:%S") - dt.datetime(1900, 1, 1)
+            assert parse_dauer(dauer) == parsed
+
+
+def clear_caches() -> None:
+    for func in parse_datum, parse_zeit, parse_dauer:
+        func.cache_clear()
+
+
+def measure(func: Callable[[RawFields], None], fields: RawFields) -> float:
+    start = time.perf_counter()
+    func(fields)
+    return time.perf_counter() - start
+
+
+@app.command()
+def compare(filmliste: Path, repetitions: int = 5) -> None:
+    """Vergleiche `strptime` mit den Parsern aus `mtv_cli.film`"""
+    unzipped = get_lzma_fp(filmliste)
+    fields = [
+        (raw[3], raw[4], raw[5])
+        for raw in iter_raw_entries(unzipped, FilmlistParser.RECORDS)
+    ]
+    assert_same_results(fields)
+
+    print(f"{len(fields)} Einträge, je {repetitions} Wiederholungen")
+    for name, func in [
+        ("strptime", parse_with_strptime),
+        ("fixes Format", parse_fixed_format),
+    ]:
+        timings = []
+        for _ in range(repetitions):
+            # Jede Wiederholung beginnt mit leerem Cache, wie bei einem Update.
+            clear_caches()
+            timings.append(measure(func, fields))
+        print(f"{name:>15}: {min(timings):.3f}s (bester Lauf)")
+
+
+if __name__ == "__main__":
+    app()
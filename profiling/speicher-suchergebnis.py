@@ -0,0 +1,49 @@
+import sqlite3
+import time
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from pathlib import Path
+
+import typer
+
+from mtv_cli.film import MovieListItem
+
+app = typer.Typer()
+
+# Gleiche Felder wie MovieListItem, aber mit `__dict__` je Instanz
+MovieListItemMitDict = make_dataclass(
+    "MovieListItemMitDict",
+    [(field.name, field.type) for field in fields(MovieListItem)],
+    frozen=True,
+)
+
+
+@app.command()
+def compare(dbfile: Path, table: str = "filme") -> None:
+    """Speicherbedarf eines Suchergebnisses über die ganze Filmdatenbank"""
+    with sqlite3.connect(dbfile) as con:
+        # Die letzte Spalte ist die interne ID.
+        rows = [row[:-1] for row in con.execute(f"SELECT * FROM {table}")]
+    print(f"{len(rows)} Zeilen")
+
+    for cls in MovieListItemMitDict, MovieListItem:
+        # Die Zeit wird ohne tracemalloc gemessen, da es stark bremst.
+        start = time.perf_counter()
+        result = [cls(*row) for row in rows]
+        duration = time.perf_counter() - start
+        del result
+
+        tracemalloc.start()
+        result = [cls(*row) for row in rows]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        per_item = current / len(result)
+        print(
+            f"{cls.__name__:>20}: {current / 2**20:7.1f} MiB"
+            f" ({per_item:.0f} Byte je Film), {duration:.3f}s"
+        )
+        del result
+
+
+if __name__ == "__main__":
+    app()
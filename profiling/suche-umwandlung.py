@@ -0,0 +1,93 @@
+import datetime as dt
+import sqlite3
+import tempfile
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Iterator
+
+import typer
+
+from mtv_cli.film import MovieListItem
+from mtv_cli.storage_backend import FilmDB, UpdateMode
+
+app = typer.Typer()
+
+
+def synthetic_movies(n_movies: int) -> Iterator[MovieListItem]:
+    today = dt.date.today()
+    for n in range(n_movies):
+        yield MovieListItem(
+            sender=f"Sender {n % 20}",
+            thema=f"Thema {n % 500}",
+            titel=f"Titel {n}",
+            datum=today - dt.timedelta(days=n % 30),
+            zeit=dt.time(n % 24, n % 60),
+            dauer=dt.timedelta(minutes=n % 120),
+            groesse=n % 1000,
+            beschreibung=f"Beschreibung {n}",
+            url=f"https://example.org/video{n}.mp4",
+            website="https://example.org",
+            url_untertitel="",
+            url_rtmp="",
+            url_klein="",
+            url_rtmp_klein="",
+            url_hd="",
+            url_rtmp_hd="",
+            datuml=n,
+            url_history="",
+            geo="",
+            neu=n % 2 == 0,
+        )
+
+
+def convert_with_dicts(dbfile: Path) -> int:
+    """Umwandlung wie vor Einführung der Konverter, über Dicts und strptime"""
+    db = sqlite3.connect(dbfile, detect_types=sqlite3.PARSE_DECLTYPES)
+    db.row_factory = sqlite3.Row
+    # Ausdrücke statt Spalten umgehen die Konverter, wie bei den alten
+    # Spaltentypen.
+    expressions = {"zeit": "CAST(Zeit AS text) AS Zeit", "dauer": "Dauer + 0 AS Dauer"}
+    names = [field.name for field in fields(MovieListItem)] + ["_id"]
+    columns = [expressions.get(name, name) for name in names]
+    cursor = db.execute(f"SELECT {', '.join(columns)} FROM filme")
+    n_films = 0
+    for item in cursor.fetchall():
+        as_dict = {key.lower(): item[key] for key in item.keys()}
+        del as_dict["_id"]
+        as_dict["zeit"] = dt.datetime.strptime(as_dict["zeit"], "%H:%M").time()
+        as_dict["dauer"] = dt.timedelta(minutes=as_dict["dauer"])
+        as_dict["neu"] = bool(as_dict["neu"])
+        MovieListItem(**as_dict)
+        n_films += 1
+    db.close()
+    return n_films
+
+
+def convert_with_row_factory(dbfile: Path) -> int:
+    return sum(1 for _ in FilmDB(dbfile).finde_filme([]))
+
+
+@app.command()
+def compare(n_movies: int = 100_000, repetitions: int = 3) -> None:
+    """Vergleiche die Umwandlung von Suchergebnissen in Filme"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dbfile = Path(tmpdir) / "filme.sqlite"
+        filmDB = FilmDB(dbfile)
+        rows = filmDB.get_row_batches(synthetic_movies(n_movies))
+        filmDB.write_rows(rows, UpdateMode.FULL)
+
+        for name, func in [
+            ("Dicts", convert_with_dicts),
+            ("Row-Factory", convert_with_row_factory),
+        ]:
+            timings = []
+            for _ in range(repetitions):
+                start = time.perf_counter()
+                n_films = func(dbfile)
+                timings.append(time.perf_counter() - start)
+            print(f"{name:>12}: {n_films} Filme in {min(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,293 @@
+import datetime as dt
+import json
+import lzma
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import typer
+from loguru import logger
+
+from mtv_cli.content_retrieval import (
+    FilmlistParser,
+    extract_entries_from_filmliste,
+    get_lzma_fp,
+    inherit_sender_thema,
+    iter_raw_entries,
+)
+from mtv_cli.film import MovieListItem
+from mtv_cli.film_filter import AgeDurationFilter, RawAgeDurationFilter
+from mtv_cli.storage_backend import FilmDB, UpdateMode
+
+app = typer.Typer()
+
+SENDER = (
+    "3Sat ARD ARTE.DE BR DW HR KiKA MDR NDR ORF PHOENIX RBB SR SRF SWR WDR ZDF"
+    " ZDF-tivi"
+).split()
+WOERTER = (
+    "Reportage über die Geschichte des Landes mit neuen Bildern aus Städten und"
+    " Dörfern Gespräche Größe Wissenschaft Natur Politik Kultur Sport Nachrichten"
+).split()
+HEADER = [
+    "Sender",
+    "Thema",
+    "Titel",
+    "Datum",
+    "Zeit",
+    "Dauer",
+    "Größe [MB]",
+    "Beschreibung",
+    "Url",
+    "Website",
+    "Url Untertitel",
+    "Url RTMP",
+    "Url Klein",
+    "Url RTMP Klein",
+    "Url HD",
+    "Url RTMP HD",
+    "DatumL",
+    "Url History",
+    "Geo",
+    "neu",
+]
+
+
+def synthetic_entries(
+    n_entries: int, n_themen: int, description_words: int, today: dt.date, seed: int
+) -> Iterator[list[str]]:
+    """
+    Einträge wie in der Filmliste erzeugen, nach Sender und Thema sortiert
+
+    Wie in der echten Filmliste bleiben Sender und Thema leer, wenn sie sich
+    gegenüber dem vorherigen Eintrag nicht ändern. Die URLs kleiner und
+    hochauflösender Fassungen sind als Präfixlänge und Suffix kodiert.
+    """
+    rng = random.Random(seed)
+    keys = sorted(
+        (rng.choice(SENDER), rng.randrange(n_themen), n) for n in range(n_entries)
+    )
+    last_sender = last_thema = ""
+    for sender, thema_nr, n in keys:
+        thema = f"Thema {thema_nr}"
+        datum = today - dt.timedelta(days=rng.randrange(-3, 90))
+        zeit = dt.time(rng.randrange(24), rng.randrange(60))
+        dauer = dt.timedelta(seconds=rng.randrange(30, 3 * 3600))
+        n_words = rng.randrange(2 * description_words + 1)
+        base = f"https://media.example.org/{sender.lower()}/{datum:%Y/%m/%d}/"
+        url = f"{base}film{n}_sd.mp4"
+        timestamp = dt.datetime.combine(datum, zeit).timestamp()
+        # Livestreams und Ähnliches haben weder Datum noch Dauer.
+        has_datum = rng.random() > 0.01
+        yield [
+            "" if sender == last_sender else sender,
+            "" if thema == last_thema and sender == last_sender else thema,
+            f"Folge {n}: {rng.choice(WOERTER).title()} {rng.choice(WOERTER)}",
+            f"{datum:%d.%m.%Y}" if has_datum else "",
+            f"{zeit:%H:%M:%S}" if has_datum else "",
+            f"{dauer.seconds // 3600:02}:{dauer.seconds // 60 % 60:02}:"
+            f"{dauer.seconds % 60:02}"
+            if has_datum
+            else "",
+            str(rng.randrange(1, 2000)),
+            " ".join(rng.choice(WOERTER) for _ in range(n_words)),
+            url,
+            f"https://www.example.org/{sender.lower()}/{n}",
+            f"{base}film{n}.xml" if rng.random() < 0.3 else "",
+            "",
+            f"{len(base)}|film{n}_low.mp4",
+            "",
+            f"{len(base)}|film{n}_hd.mp4" if rng.random() < 0.7 else "",
+            "",
+            str(int(timestamp)) if has_datum else "",
+            "",
+            rng.choice(["", "", "DE", "DE-AT-CH"]),
+            "true" if rng.random() < 0.05 else "false",
+        ]
+        last_sender, last_thema = sender, thema
+
+
+@app.command()
+def generate(
+    ziel: Path = typer.Argument(..., help="Pfad ohne Endung für .json und .xz"),
+    n_entries: int = 500_000,
+    n_themen: int = 2_000,
+    description_words: int = 40,
+    today: Optional[dt.datetime] = typer.Option(None, formats=["%Y-%m-%d"]),
+    seed: int = 0,
+    xz_preset: int = 6,
+) -> None:
+    """Reproduzierbare Filmliste als .json und .xz schreiben"""
+    stichtag = dt.date.today() if today is None else today.date()
+    json_file = ziel.with_suffix(".json")
+    xz_file = ziel.with_suffix(".xz")
+    meta = [f"{stichtag:%d.%m.%Y}, 06:00", f"{stichtag:%d.%m.%Y}, 05:00", "3", "", ""]
+    with ExitStack() as stack:
+        handles = [
+            stack.enter_context(json_file.open("w", encoding="utf-8")),
+            stack.enter_context(
+                lzma.open(xz_file, "wt", encoding="utf-8", preset=xz_preset)
+            ),
+        ]
+        entries = synthetic_entries(
+            n_entries, n_themen, description_words, stichtag, seed
+        )
+        for fh in handles:
+            fh.write(f'{{"Filmliste":{json.dumps(meta)},')
+            fh.write(f'"Filmliste":{json.dumps(HEADER, ensure_ascii=False)}')
+        for entry in entries:
+            line = f',\n"X":{json.dumps(entry, ensure_ascii=False)}'
+            for fh in handles:
+                fh.write(line)
+        for fh in handles:
+            fh.write("}")
+    for path in json_file, xz_file:
+        print(f"{path}: {path.stat().st_size / 2**20:.1f} MiB")
+
+
+def decompress(filmliste: Path) -> None:
+    with lzma.open(filmliste) as fh:
+        while fh.read(2**20):
+            pass
+
+
+def parse(filmliste: Path) -> None:
+    raw_entries = iter_raw_entries(get_lzma_fp(filmliste), FilmlistParser.RECORDS)
+    for _ in inherit_sender_thema(raw_entries):
+        pass
+
+
+def build(filmliste: Path) -> None:
+    raw_entries = iter_raw_entries(get_lzma_fp(filmliste), FilmlistParser.RECORDS)
+    for raw_entry in inherit_sender_thema(raw_entries):
+        MovieListItem.from_item_list(raw_entry)
+
+
+def filter_films(filmliste: Path, filter_kwargs: dict[str, Any]) -> None:
+    film_filter = AgeDurationFilter(**filter_kwargs)
+    raw_entries = iter_raw_entries(get_lzma_fp(filmliste), FilmlistParser.RECORDS)
+    for raw_entry in inherit_sender_thema(raw_entries):
+        film_filter.is_permitted(MovieListItem.from_item_list(raw_entry))
+
+
+def update(filmliste: Path, dbfile: Path, filter_kwargs: dict[str, Any]) -> None:
+    prefilter = RawAgeDurationFilter(**filter_kwargs)
+    film_filter = AgeDurationFilter(**filter_kwargs)
+    movies = extract_entries_from_filmliste(
+        get_lzma_fp(filmliste), FilmlistParser.RECORDS, prefilter
+    )
+    relevant = (film for film in movies if film_filter.is_permitted(film))
+    with FilmDB(dbfile) as filmDB:
+        filmDB.write_rows(filmDB.get_row_batches(relevant), UpdateMode.FULL)
+
+
+@app.command()
+def benchmark(
+    filmliste: Optional[Path] = typer.Option(
+        None, help="Filmliste als .xz, ohne Angabe wird eine erzeugt"
+    ),
+    n_entries: int = 200_000,
+    max_age: int = 30,
+    min_duration: int = 5,
+    today: Optional[dt.datetime] = typer.Option(None, formats=["%Y-%m-%d"]),
+    repetitions: int = 3,
+) -> None:
+    """
+    Laufzeit der Stufen von aktualisiere-filmliste messen
+
+    Jeder Durchlauf führt eine Stufe mehr aus, die Differenz zum vorherigen
+    Durchlauf ist die Laufzeit der Stufe. Der letzte Durchlauf entspricht
+    aktualisiere-filmliste. Da dort der Vorfilter Einträge vor dem Erzeugen
+    der Filme verwirft, kann dessen Differenz auch kleiner als die reine
+    Laufzeit von SQLite sein. Der Spitzenspeicher wird an einem Aufruf von
+    mtv-cli in einem eigenen Prozess gemessen.
+    """
+    logger.disable("mtv_cli")
+    stichtag = dt.date.today() if today is None else today.date()
+    filter_kwargs = dict(max_age=max_age, min_duration=min_duration, today=stichtag)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        if filmliste is None:
+            filmliste = tmp / "filmliste.xz"
+            generate(
+                tmp / "filmliste",
+                n_entries,
+                today=dt.datetime.combine(stichtag, dt.time()),
+            )
+        stages: list[tuple[str, Callable[[Path], None]]] = [
+            ("Entpacken", decompress),
+            ("+ JSON parsen", parse),
+            ("+ Filme erzeugen", build),
+            ("+ Filtern", partial(filter_films, filter_kwargs=filter_kwargs)),
+            (
+                "+ SQLite, mit Vorfilter",
+                partial(
+                    update,
+                    dbfile=tmp / "benchmark.sqlite",
+                    filter_kwargs=filter_kwargs,
+                ),
+            ),
+        ]
+        time_stages(stages, filmliste, repetitions)
+        measure_cli(filmliste, tmp, max_age, min_duration)
+
+
+def time_stages(
+    stages: list[tuple[str, Callable[[Path], None]]],
+    filmliste: Path,
+    repetitions: int,
+) -> None:
+    """Schnellsten von `repetitions` Durchläufen jeder Stufe ausgeben"""
+    previous = 0.0
+    for name, stage in stages:
+        timings = []
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            stage(filmliste)
+            timings.append(time.perf_counter() - start)
+        total = min(timings)
+        print(f"{name:>25}: {total:7.2f}s gesamt, {total - previous:+7.2f}s")
+        previous = total
+
+
+def measure_cli(filmliste: Path, tmp: Path, max_age: int, min_duration: int) -> None:
+    """aktualisiere-filmliste als eigenen Prozess ausführen und vermessen"""
+    config = tmp / "mtv-cli.cfg"
+    config.write_text(
+        "[CONFIG]\nMSG_LEVEL: WARNING\n"
+        f"MAX_ALTER: {max_age}\nMIN_DAUER: {min_duration}\n"
+        f"ZIEL_DOWNLOADS: {tmp}\nQUALITAET: HD\n"
+    )
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "mtv_cli.cli",
+            "aktualisiere-filmliste",
+            "--config",
+            str(config),
+            "--dbfile",
+            str(tmp / "cli.sqlite"),
+            "--quelle",
+            str(filmliste),
+        ],
+        check=True,
+    )
+    duration = time.perf_counter() - start
+    max_rss_mib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(
+        f"{'aktualisiere-filmliste':>25}: {duration:7.2f}s,"
+        f" Spitzenspeicher {max_rss_mib:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    app()
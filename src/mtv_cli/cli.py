@@ -14,8 +14,10 @@ import datetime as dt
 import re
 import sys
 from dataclasses import asdict
+from functools import partial
+from itertools import chain
 from pathlib import Path
-from typing import Any, Iterable, Optional, TextIO
+from typing import Any, Iterable, Iterator, Optional, TextIO
 
 import typer
 from loguru import logger
@@ -23,22 +25,40 @@ from pick import pick
 
 from mtv_cli.constants import (
     FILME_SQLITE,
+    MAX_ALTER_DIFF_BASIS,
     MTV_CLI_CONFIG,
     MTV_CLI_HOME,
     SEL_FORMAT,
     SEL_TITEL,
     URL_FILMLISTE,
+    URL_FILMLISTE_DIFF,
 )
 from mtv_cli.content_retrieval import (
-    FilmDownloadFehlerhaft,
+    BandwidthLimiter,
+    FilmlistParser,
     LowMemoryFileSystemDownloader,
+    create_session,
     extract_entries_from_filmliste,
     get_lzma_fp,
     get_url_fp,
 )
 from mtv_cli.film import MovieListItem, MovieQuality
-from mtv_cli.film_filter import AgeDurationFilter
-from mtv_cli.storage_backend import DownloadStatus, FilmDB
+from mtv_cli.film_filter import AgeDurationFilter, RawAgeDurationFilter
+from mtv_cli.ingest_stats import IngestStats
+from mtv_cli.parallel_download import (
+    DEFAULT_MAX_PER_HOST,
+    DEFAULT_N_TRANSFERS,
+    download_parallel,
+    get_host,
+)
+from mtv_cli.parallel_ingest import ingest_parallel
+from mtv_cli.search_query import SuchausdruckFehlerhaft
+from mtv_cli.storage_backend import (
+    DEFAULT_BATCH_SIZE,
+    DownloadStatus,
+    FilmDB,
+    UpdateMode,
+)
 
 app = typer.Typer(name="mtv-cli")
 
@@ -51,6 +71,15 @@ LOGLEVEL_OPTION = typer.Option(None, help="Level für Logausgabe")
 MAYBE_DBFILE_OPTION = typer.Option(FILME_SQLITE, help="Datei mit SQLITE-Datenbankdatei")
 MAYBE_QUALITY_OPTION = typer.Option(None, help="Gewünschte Filmqualität.")
 QUERY_ARG = typer.Argument(None, help="Suchausdrücke")
+PREALLOCATE_OPTION = typer.Option(
+    False, help="Speicherplatz segmentierter Downloads vorab reservieren."
+)
+SEGMENTS_OPTION = typer.Option(
+    1,
+    min=1,
+    help="Anzahl gleichzeitiger Verbindungen je Film, sofern der Server"
+    " Teildownloads unterstützt.",
+)
 
 
 def setup_logging(level: Optional[str], config) -> None:
@@ -91,7 +120,29 @@ def aktualisiere_filmliste(
     dbfile: Path = MAYBE_DBFILE_OPTION,
     quelle: str = typer.Option(
         URL_FILMLISTE,
-        help="Quelle für neue Filmliste. Erlaubte Werte sind auto|json|Url|Datei.",
+        help="Quelle für neue Filmliste. Erlaubte Werte sind auto|diff|json|Url|Datei."
+        " Dateien mit Endung .xz werden entpackt.",
+    ),
+    inkrementell: bool = typer.Option(
+        False,
+        help="Gleiche bestehende Filmliste ab, statt sie komplett neu aufzubauen.",
+    ),
+    stapelgroesse: int = typer.Option(
+        DEFAULT_BATCH_SIZE,
+        help="Anzahl Filme, die auf einmal in die Datenbank geschrieben werden.",
+    ),
+    parser: FilmlistParser = typer.Option(
+        FilmlistParser.RECORDS, help="Verfahren zum Einlesen der Filmliste."
+    ),
+    arbeitsprozesse: int = typer.Option(
+        0,
+        help="Anzahl Prozesse zur Umwandlung der Filmliste. Bei 0 wird die"
+        " Filmliste in einem einzigen Prozess verarbeitet.",
+    ),
+    statistik_speichern: bool = typer.Option(
+        False,
+        help="Zähler und Laufzeiten als JSON unter dem Schlüssel _statistik in"
+        " der Status-Tabelle ablegen.",
     ),
     log_level: str = LOGLEVEL_OPTION,
 ) -> None:
@@ -99,22 +150,62 @@ def aktualisiere_filmliste(
     # TODO: Führe UpdateSource als ContextManager ein
     cfg = load_configuration(config)
     setup_logging(log_level, cfg)
-    film_filter = AgeDurationFilter(
-        max_age=cfg["MAX_ALTER"],
-        min_duration=cfg["MIN_DAUER"],
-    )
-
-    fh = get_update_source_file_handle(quelle)
-    all_movies = extract_entries_from_filmliste(fh)
-    relevant_movies = (movie for movie in all_movies if film_filter.is_permitted(movie))
-
-    filmDB = FilmDB(dbfile)
-    filmDB.insert_movies(relevant_movies)
+    filter_kwargs = dict(max_age=cfg["MAX_ALTER"], min_duration=cfg["MIN_DAUER"])
+    prefilter = RawAgeDurationFilter(**filter_kwargs)
+    film_filter = AgeDurationFilter(**filter_kwargs)
+
+    with FilmDB(dbfile, batch_size=stapelgroesse) as filmDB:
+        if quelle == "diff" and not diff_basis_ist_aktuell(filmDB):
+            logger.info("Filmliste zu alt für Diff-Liste, lade vollständige Filmliste.")
+            quelle = "auto"
+
+        if quelle == "diff":
+            mode = UpdateMode.DIFF
+        elif inkrementell:
+            mode = UpdateMode.INCREMENTAL
+        else:
+            mode = UpdateMode.FULL
+
+        stats = IngestStats()
+        fh = stats.measure_reads(get_update_source_file_handle(quelle))
+        if arbeitsprozesse > 0:
+            ingest_parallel(
+                fh,
+                parser,
+                prefilter,
+                film_filter,
+                filmDB,
+                mode,
+                arbeitsprozesse,
+                stats,
+            )
+        else:
+            relevant_movies = extract_entries_from_filmliste(
+                fh, parser, prefilter, film_filter, stats
+            )
+            stats.measure_writes(
+                partial(filmDB.write_rows, mode=mode),
+                filmDB.get_row_batches(relevant_movies),
+            )
+        stats.finish()
+        stats.log_summary()
+        if statistik_speichern:
+            filmDB.save_status("_statistik", stats.to_json())
+
+
+def diff_basis_ist_aktuell(filmDB: FilmDB) -> bool:
+    """Prüfe, ob die Filmdatenbank als Basis für eine Diff-Liste taugt"""
+    letzte_aktualisierung = filmDB.get_status_time("_akt")
+    if letzte_aktualisierung is None:
+        return False
+    return dt.datetime.now() - letzte_aktualisierung <= MAX_ALTER_DIFF_BASIS
 
 
 def get_update_source_file_handle(update_source: str) -> TextIO:
     if update_source == "auto":
         src = URL_FILMLISTE
+    elif update_source == "diff":
+        src = URL_FILMLISTE_DIFF
     elif update_source == "json":
         # existierende Filmliste verwenden
         src = str(MTV_CLI_HOME / "filme.json")
@@ -123,6 +214,8 @@ def get_update_source_file_handle(update_source: str) -> TextIO:
 
     if src.startswith("http"):
         return get_lzma_fp(get_url_fp(src))
+    elif src.endswith(".xz"):
+        return get_lzma_fp(src)
     else:
         return open(src, "r", encoding="utf-8")
 
@@ -164,7 +257,7 @@ def get_suche() -> Iterable[str]:
                 yield token[0].strip() + ":" + token[1]
 
 
-def get_select(filme: list[MovieListItem]) -> Iterable[str]:
+def get_select(filme: Iterable[MovieListItem]) -> Iterable[str]:
     for film in filme:
         sender = film.sender
         thema = film.thema
@@ -174,11 +267,19 @@ def get_select(filme: list[MovieListItem]) -> Iterable[str]:
         yield SEL_FORMAT.format(sender, thema, datum, dauer, titel)
 
 
-def filme_suchen(query: Optional[list[str]], filmDB: FilmDB) -> Iterable[MovieListItem]:
+def filme_suchen(
+    query: Optional[list[str]],
+    filmDB: FilmDB,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> Iterator[MovieListItem]:
     """Filme gemäß Vorgabe suchen"""
     if query is None:
         query = list(get_suche())
-    return filmDB.finde_filme(query)
+    try:
+        return filmDB.finde_filme(query, limit, offset)
+    except SuchausdruckFehlerhaft as e:
+        sys.exit(f"Suchausdruck fehlerhaft! Fehler: {e}")
 
 
 def zeige_liste(filme: list[MovieListItem]) -> list[tuple[str, int]]:
@@ -199,15 +300,15 @@ def filme_vormerken(
     """Filmliste anzeigen, Auswahl für späteren Download speichern"""
     options = load_configuration(config)
     setup_logging(log_level, options)
-    filmDB: FilmDB = FilmDB(dbfile)
-    selected_filme = list(
-        select_movies_for_download(suche, filmDB=filmDB, do_batch=False)
-    )
+    with FilmDB(dbfile) as filmDB:
+        selected_filme = list(
+            select_movies_for_download(suche, filmDB=filmDB, do_batch=False)
+        )
 
-    total = len(selected_filme)
-    num_changes = filmDB.save_downloads(selected_filme, status="V")
-    logger.info(f"{num_changes} von {total} Filme vorgemerkt für Download")
-    return num_changes
+        total = len(selected_filme)
+        num_changes = filmDB.save_downloads(selected_filme, status="V")
+        logger.info(f"{num_changes} von {total} Filme vorgemerkt für Download")
+        return num_changes
 
 
 @app.command()
@@ -216,20 +317,29 @@ def sofort_herunterladen(
     dbfile: Path = DBFILE_OPTION,
     log_level: Optional[str] = LOGLEVEL_OPTION,
     qualitaet: Optional[MovieQuality] = MAYBE_QUALITY_OPTION,
+    segmente: int = SEGMENTS_OPTION,
+    vorab_reservieren: bool = PREALLOCATE_OPTION,
     suche: Optional[list[str]] = QUERY_ARG,
 ) -> None:
     """Filmliste anzeigen, sofortiger Download nach Auswahl"""
     options = load_configuration(config)
     setup_logging(log_level, options)
-    filmDB = FilmDB(dbfile)
-    zielordner: Path = options["ZIEL_DOWNLOADS"]
-    qualitaet = options["QUALITAET"] if qualitaet is None else qualitaet
-    retriever = LowMemoryFileSystemDownloader(root=zielordner, quality=qualitaet)
+    with FilmDB(dbfile) as filmDB:
+        zielordner: Path = options["ZIEL_DOWNLOADS"]
+        qualitaet = options["QUALITAET"] if qualitaet is None else qualitaet
+        retriever = LowMemoryFileSystemDownloader(
+            root=zielordner,
+            quality=qualitaet,
+            segments=segmente,
+            preallocate=vorab_reservieren,
+        )
 
-    selected_movies = select_movies_for_download(suche, filmDB=filmDB, do_batch=False)
-    for film in selected_movies:
-        logger.info(f"About to download {film}.")
-        retriever.download_film(film)
+        selected_movies = select_movies_for_download(
+            suche, filmDB=filmDB, do_batch=False
+        )
+        for film in selected_movies:
+            logger.info(f"About to download {film}.")
+            retriever.download_film(film)
 
 
 def select_movies_for_download(
@@ -256,28 +366,59 @@ def vormerkungen_herunterladen(
     dbfile: Path = DBFILE_OPTION,
     log_level: Optional[str] = LOGLEVEL_OPTION,
     qualitaet: Optional[MovieQuality] = MAYBE_QUALITY_OPTION,
+    segmente: int = SEGMENTS_OPTION,
+    vorab_reservieren: bool = PREALLOCATE_OPTION,
+    gleichzeitige_downloads: int = typer.Option(
+        DEFAULT_N_TRANSFERS, min=1, help="Anzahl gleichzeitiger Downloads."
+    ),
+    downloads_je_server: int = typer.Option(
+        DEFAULT_MAX_PER_HOST,
+        min=1,
+        help="Anzahl gleichzeitiger Downloads vom selben Server.",
+    ),
+    max_bandbreite: Optional[int] = typer.Option(
+        None,
+        min=1,
+        help="Gemeinsame Obergrenze aller Downloads in KiB/s. Ohne Angabe"
+        " unbegrenzt.",
+    ),
 ) -> None:
     """Download vorgemerkter Filme"""
     options = load_configuration(config)
     setup_logging(log_level, options)
     zielordner: Path = options["ZIEL_DOWNLOADS"]
-    filmDB: FilmDB = FilmDB(dbfile)
-    qualitaet = options["QUALITAET"] if qualitaet is None else qualitaet
-    retriever = LowMemoryFileSystemDownloader(root=zielordner, quality=qualitaet)
-
-    selected_movies = list(filmDB.read_downloads(status=["V", "F"]))
-    if len(selected_movies) == 0:
-        logger.info("Keine vorgemerkten Filme vorhanden")
-        return
-    for film, _, _ in selected_movies:
-        logger.info(f"About to download {film}.")
-        try:
-            retriever.download_film(film)
-            download_was_successful = True
-        except FilmDownloadFehlerhaft:
-            download_was_successful = False
-        filmDB.update_downloads(film, "K" if download_was_successful else "F")
-    filmDB.save_status("_download")
+    with FilmDB(dbfile) as filmDB:
+        qualitaet = options["QUALITAET"] if qualitaet is None else qualitaet
+        limiter = (
+            None if max_bandbreite is None else BandwidthLimiter(1024 * max_bandbreite)
+        )
+        selected_movies = list(filmDB.read_downloads(status=["V", "F"]))
+        if len(selected_movies) == 0:
+            logger.info("Keine vorgemerkten Filme vorhanden")
+            return
+        hosts = {get_host(film, qualitaet) for film, _, _ in selected_movies}
+        retriever = LowMemoryFileSystemDownloader(
+            root=zielordner,
+            quality=qualitaet,
+            bandwidth_limiter=limiter,
+            segments=segmente,
+            preallocate=vorab_reservieren,
+            # Genug Verbindungen, damit jeder Download zu einem Server eine
+            # offene Verbindung wiederverwenden kann, und zwar für alle Server
+            session=create_session(
+                pool_size=downloads_je_server * segmente, n_hosts=len(hosts)
+            ),
+        )
+        results = download_parallel(
+            retriever,
+            (film for film, _, _ in selected_movies),
+            gleichzeitige_downloads,
+            downloads_je_server,
+        )
+        # Der Status wird im Hauptthread geschrieben, sobald ein Download endet.
+        for film, download_was_successful in results:
+            filmDB.update_downloads(film, "K" if download_was_successful else "F")
+        filmDB.save_status("_download")
 
 
 @app.command()
@@ -286,26 +427,36 @@ def suche(
     dbfile: Path = DBFILE_OPTION,
     stapelverarbeitung: bool = BATCH_PROCESSING_OPTION,
     log_level: str = LOGLEVEL_OPTION,
+    limit: Optional[int] = typer.Option(
+        None, min=0, help="Höchstens so viele Treffer ausgeben."
+    ),
+    offset: int = typer.Option(
+        0, min=0, help="So viele Treffer überspringen, etwa zum Blättern."
+    ),
     suche: Optional[list[str]] = QUERY_ARG,
 ) -> None:
     """Suche Film ohne diesen herunterzuladen"""
     options = load_configuration(config)
     setup_logging(log_level, options)
-    filmDB = FilmDB(dbfile)
-    filme = list(filme_suchen(suche, filmDB))
-    if len(filme) == 0:
-        return
-
-    if stapelverarbeitung:
-        print("[")
-        for film in filme:
-            print(asdict(film), end=",")
-        print("]")
-    else:
-        print(SEL_TITEL)
-        print(len(SEL_TITEL) * "_")
-        for line in get_select(filme):
-            print(line)
+    with FilmDB(dbfile) as filmDB:
+        # Die Treffer werden gestreamt, damit auch sehr große Ergebnisse in
+        # konstantem Speicher ausgegeben werden.
+        treffer = filme_suchen(suche, filmDB, limit, offset)
+        erster_film = next(treffer, None)
+        if erster_film is None:
+            return
+        filme = chain([erster_film], treffer)
+
+        if stapelverarbeitung:
+            print("[")
+            for film in filme:
+                print(asdict(film), end=",")
+            print("]")
+        else:
+            print(SEL_TITEL)
+            print(len(SEL_TITEL) * "_")
+            for line in get_select(filme):
+                print(line)
 
 
 @app.command()
@@ -356,24 +507,24 @@ def entferne_filmvormerkungen(
         )
 
     # Liste lesen
-    filmDB: FilmDB = FilmDB(dbfile)
-    filme = list(filmDB.read_downloads())
-    if len(filme) == 0:
-        logger.info("Keine vorgemerkten Filme vorhanden")
-        return
-
-    # Liste aufbereiten
-    selected = pick(
-        filme, DLL_TITEL, multiselect=True, options_map_func=format_download_row
-    )
+    with FilmDB(dbfile) as filmDB:
+        filme = list(filmDB.read_downloads())
+        if len(filme) == 0:
+            logger.info("Keine vorgemerkten Filme vorhanden")
+            return
+
+        # Liste aufbereiten
+        selected = pick(
+            filme, DLL_TITEL, multiselect=True, options_map_func=format_download_row
+        )
 
-    # IDs extrahieren und Daten löschen
-    deletes = []
-    for sel_text, sel_index in selected:
-        film = filme[sel_index][0]
-        deletes.append(film)
-    changes = filmDB.delete_downloads(deletes)
-    logger.info("%d vorgemerkte Filme gelöscht" % changes)
+        # IDs extrahieren und Daten löschen
+        deletes = []
+        for sel_text, sel_index in selected:
+            film = filme[sel_index][0]
+            deletes.append(film)
+        changes = filmDB.delete_downloads(deletes)
+        logger.info("%d vorgemerkte Filme gelöscht" % changes)
 
 
 def main() -> None:
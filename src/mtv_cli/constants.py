@@ -8,6 +8,7 @@
 # Website: https://github.com/bablokb/mtv_cli
 #
 
+import datetime as dt
 import os
 from pathlib import Path
 
@@ -26,3 +27,8 @@ MTV_CLI_CONFIG = Path(os.getenv("XDG_CONFIG_HOME", DEFAULT_CONFIG_DIR)) / "mtv-c
 FILME_SQLITE = Path(os.getenv("XDG_CACHE_HOME", DEFAULT_CACHE_DIR)) / "mtv-cli.sqlite"
 
 URL_FILMLISTE = "https://liste.mediathekview.de/Filmliste-akt.xz"
+URL_FILMLISTE_DIFF = "https://liste.mediathekview.de/Filmliste-diff.xz"
+# Die Diff-Liste enthält nur Änderungen gegenüber der letzten vollständigen
+# Filmliste. Ist die eigene Datenbank älter, fehlen ihr Einträge, die die
+# Diff-Liste nicht mehr enthält.
+MAX_ALTER_DIFF_BASIS = dt.timedelta(days=1)
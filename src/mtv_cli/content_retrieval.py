@@ -8,27 +8,193 @@
 # Website: https://github.com/bablokb/mtv_cli
 #
 
+from __future__ import annotations
+
+import datetime as dt
+import errno
+import http.client
 import lzma
-import urllib.request as request
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
 from pathlib import Path
-from typing import Iterable, Optional, TextIO
+from typing import Iterable, Iterator, Optional, TextIO
 
 import ijson  # type: ignore[import]
 import requests
+import urllib3
 from loguru import logger
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+from urllib3.util.retry import Retry
 
 from mtv_cli.film import MovieListItem, MovieQuality
+from mtv_cli.film_filter import FilmFilter, RawEntryFilter
+from mtv_cli.ingest_stats import IngestStats
+
+# Verbindungen je Server, die eine Session offen hält
+DEFAULT_POOL_SIZE = 10
+# Server, für die eine Session gleichzeitig Verbindungen offen hält
+DEFAULT_POOL_HOSTS = 10
+# Wiederholungen bei Verbindungsfehlern und vorübergehenden Serverfehlern
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Zeitlimits in Sekunden für den Verbindungsaufbau und zwischen zwei Lesevorgängen
+DEFAULT_TIMEOUT = (10.0, 60.0)
+# Abstand in Sekunden zwischen zwei Fortschrittsmeldungen eines Downloads
+PROGRESS_INTERVAL_S = 10.0
 
 
 class FilmDownloadFehlerhaft(RuntimeError):
     pass
 
 
+def create_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    n_hosts: int = DEFAULT_POOL_HOSTS,
+    retries: int = DEFAULT_RETRIES,
+) -> requests.Session:
+    """
+    HTTP-Session mit Verbindungspool und automatischen Wiederholungen
+
+    Eine Session hält Verbindungen offen, sodass weitere Anfragen an denselben
+    Server ohne neuen TCP- und TLS-Verbindungsaufbau auskommen. Sie darf von
+    mehreren Threads genutzt werden, `pool_size` sollte dann mindestens der
+    Anzahl gleichzeitiger Verbindungen zu einem Server entsprechen.
+
+    Verbindungen werden für höchstens `n_hosts` Server vorgehalten. Wird ein
+    weiterer Server angefragt, schließt die Session die Verbindungen des am
+    längsten nicht genutzten Servers.
+
+    Wiederholt werden nur GET- und HEAD-Anfragen, mit exponentiell
+    wachsender Wartezeit. Bricht eine Verbindung erst während der Übertragung
+    ab, greift stattdessen das Fortsetzen von Downloads.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=n_hosts, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class FilmlistParser(str, Enum):
+    EVENTS = "events"
+    RECORDS = "records"
+
+
+class BandwidthLimiter:
+    """
+    Gemeinsame Obergrenze für die Datenrate mehrerer Downloads
+
+    Die Begrenzung arbeitet nach dem Token-Bucket-Verfahren: Je Sekunde
+    kommen `bytes_per_second` Token hinzu, höchstens aber so viele, wie in
+    einer Sekunde übertragen werden dürfen. Wer mehr Daten verbraucht als
+    Token vorhanden sind, wartet, bis der Fehlbetrag wieder aufgefüllt ist.
+    Die Begrenzung kann von mehreren Threads gleichzeitig genutzt werden.
+    """
+
+    def __init__(self, bytes_per_second: int) -> None:
+        if bytes_per_second <= 0:
+            raise ValueError("Die Datenrate muss positiv sein.")
+        self.rate = bytes_per_second
+        self._tokens = float(bytes_per_second)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n_bytes: int) -> None:
+        """Warten, bis `n_bytes` übertragen werden dürfen"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_refill
+            self._tokens = min(self.rate, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+            self._tokens -= n_bytes
+            wait_s = -self._tokens / self.rate
+        if wait_s > 0:
+            time.sleep(wait_s)
+
+
+class DownloadProgress:
+    """
+    Regelmäßige Fortschrittsmeldungen eines Downloads
+
+    Statt jeden Chunk zu protokollieren, meldet `update` höchstens alle
+    `interval_s` Sekunden die übertragene Menge, die Datenrate seit Beginn
+    und, falls die Größe bekannt ist, die voraussichtliche Restdauer. Kann
+    von mehreren Threads gleichzeitig genutzt werden.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        total: Optional[int] = None,
+        done: int = 0,
+        interval_s: float = PROGRESS_INTERVAL_S,
+    ) -> None:
+        self.name = name
+        self.total = total
+        self.done = done
+        self.interval_s = interval_s
+        self._transferred = 0
+        self._start = self._last_report = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, n_bytes: int) -> None:
+        with self._lock:
+            self.done += n_bytes
+            self._transferred += n_bytes
+            now = time.monotonic()
+            if now - self._last_report < self.interval_s:
+                return
+            self._last_report = now
+            message = self._describe(now)
+        logger.info(message)
+
+    def finish(self) -> None:
+        with self._lock:
+            message = self._describe(time.monotonic(), with_eta=False)
+        logger.info(f"{message}, abgeschlossen")
+
+    def _describe(self, now: float, with_eta: bool = True) -> str:
+        rate = self._transferred / max(now - self._start, 1e-9)
+        message = f"{self.name}: {self.done / 2**20:.1f}"
+        if self.total is not None:
+            message += f" von {self.total / 2**20:.1f}"
+        message += f" MiB, {rate / 2**20:.2f} MiB/s"
+        if with_eta and self.total is not None and rate > 0:
+            remaining_s = max(self.total - self.done, 0) / rate
+            message += f", noch {dt.timedelta(seconds=round(remaining_s))}"
+        return message
+
+
 class LowMemoryFileSystemDownloader(BaseModel):
     root: Path
     quality: MovieQuality
     chunk_size: int = 1024 * 1024  # 1 MiB
+    # Wird von allen Downloads geteilt, die diesen Downloader nutzen
+    bandwidth_limiter: Optional[BandwidthLimiter] = None
+    # Anzahl paralleler Verbindungen je Film, siehe `download_segmented`
+    segments: int = 1
+    # Speicherplatz segmentierter Downloads vorab reservieren
+    preallocate: bool = False
+    session: requests.Session = Field(default_factory=create_session)
+    timeout: tuple[float, float] = DEFAULT_TIMEOUT
+
+    class Config:
+        arbitrary_types_allowed = True
 
     def get_filename(self, film: MovieListItem) -> Path:
         # Infos zusammensuchen
@@ -47,24 +213,444 @@ class LowMemoryFileSystemDownloader(BaseModel):
                 f"Angeforderte Qualität {self.quality} ist für Film {film} nicht"
                 " vorhanden! Nutze stattdessen {real_quality}."
             )
-        response = requests.get(url, stream=True)
+        target = self.get_filename(film)
+        part_file = get_part_file(target)
+        info_file = get_partial_download_file(part_file)
+        # Fortsetzbare Teildateien werden nicht segmentiert geladen.
+        use_segments = (
+            self.segments > 1 and PartialDownload.load(info_file, url) is None
+        )
         try:
-            response.raise_for_status()
-            with self.get_filename(film).open("wb") as fh:
-                for n, chunk in enumerate(
-                    response.iter_content(chunk_size=self.chunk_size)
-                ):
-                    logger.debug(f"Verarbeite Chunk {n} der Größe {len(chunk)}.")
-                    fh.write(chunk)
-        except requests.HTTPError as http_err:
+            if not (use_segments and self.download_segmented(url, part_file)):
+                self.download_to_part_file(url, part_file)
+        except requests.RequestException as http_err:
             logger.error(f"Download des Films {film} ist fehlgeschlagen!")
             logger.exception(http_err)
             raise FilmDownloadFehlerhaft from http_err
+        part_file.replace(target)
+        info_file.unlink(missing_ok=True)
+
+    def download_segmented(self, url: str, part_file: Path) -> bool:
+        """
+        Film über mehrere Verbindungen gleichzeitig in eine Teildatei laden
+
+        Der Film wird in `segments` Byte-Bereiche aufgeteilt, die jeweils
+        eine eigene Verbindung anfordert. Die Teildatei wird vorab in voller
+        Größe angelegt, die Bereiche werden mit `os.pwrite` direkt an ihre
+        Position geschrieben. Da jede Verbindung ihren Bereich vollständig
+        prüft, kann die Datei keine Lücken enthalten.
+
+        Eine segmentierte Teildatei kann nicht fortgesetzt werden und wird
+        bei Fehlern gelöscht.
+
+        Returns:
+        --------
+        False, falls der Server den HEAD-Request ablehnt, keine
+        Range-Requests unterstützt oder der Film für eine Aufteilung zu klein
+        ist. Es wurde dann nichts geladen.
+
+        Raises:
+        -------
+        requests.RequestException, falls der Download fehlschlägt.
+        """
+        probe = self.probe_segments(url)
+        if probe is None:
+            return False
+        size, validator = probe
+        progress = DownloadProgress(part_file.name, total=size)
+        try:
+            with part_file.open("wb") as fh:
+                # Legt eine Datei mit Lücken an, die die Segmente füllen.
+                fh.truncate(size)
+                if self.preallocate:
+                    preallocate(fh.fileno(), size)
+                self.download_segments(url, validator, fh.fileno(), size, progress)
+        except BaseException:
+            part_file.unlink(missing_ok=True)
+            raise
+        progress.finish()
+        return True
+
+    def probe_segments(self, url: str) -> Optional[tuple[int, Optional[str]]]:
+        """
+        Per HEAD-Request prüfen, ob der Film segmentiert geladen werden kann
+
+        Returns:
+        --------
+        Größe des Films und Wert für `If-Range`, oder None, falls der Server
+        die Anfrage ablehnt, keine Range-Requests unterstützt oder der Film
+        für eine Aufteilung zu klein ist.
+        """
+        try:
+            probe = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        except requests.RequestException as err:
+            logger.info(f"Keine Teildownloads von {url}, HEAD-Request scheitert: {err}")
+            return None
+        if not 200 <= probe.status_code < 300:
+            logger.info(
+                f"Keine Teildownloads von {url}, HEAD-Request liefert Status"
+                f" {probe.status_code}."
+            )
+            return None
+        partial = PartialDownload.from_response(url, probe)
+        size = partial.content_length
+        if probe.headers.get("Accept-Ranges") != "bytes" or size is None:
+            logger.info(f"Server unterstützt keine Teildownloads von {url}.")
+            return None
+        if size < self.segments * self.chunk_size:
+            return None
+        return size, partial.validator
+
+    def download_segments(
+        self,
+        url: str,
+        validator: Optional[str],
+        fd: int,
+        size: int,
+        progress: DownloadProgress,
+    ) -> None:
+        """Alle Segmente gleichzeitig laden, bei einem Fehler alle abbrechen"""
+        aborted = threading.Event()
+        with ThreadPoolExecutor(
+            max_workers=self.segments, thread_name_prefix="mtv-cli-segment"
+        ) as executor:
+            futures = [
+                executor.submit(
+                    self.download_segment,
+                    url,
+                    validator,
+                    fd,
+                    byte_range,
+                    progress,
+                    aborted,
+                )
+                for byte_range in get_byte_ranges(size, self.segments)
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                aborted.set()
+                raise
+
+    def download_segment(
+        self,
+        url: str,
+        validator: Optional[str],
+        fd: int,
+        byte_range: tuple[int, int],
+        progress: DownloadProgress,
+        aborted: threading.Event,
+    ) -> None:
+        """Byte-Bereich `byte_range` (inklusive Ende) an seine Position schreiben"""
+        start, end = byte_range
+        headers = {"Range": f"bytes={start}-{end}"}
+        if validator is not None:
+            headers["If-Range"] = validator
+        with self.session.get(
+            url, headers=headers, stream=True, timeout=self.timeout
+        ) as response:
+            check_segment_response(url, response, start)
+            position = self.write_segment(response, fd, byte_range, progress, aborted)
+        if position != end + 1:
+            raise requests.RequestException(
+                f"Segment {start}-{end} von {url} unvollständig:"
+                f" {position - start} Bytes erhalten."
+            )
+
+    def write_segment(
+        self,
+        response: requests.Response,
+        fd: int,
+        byte_range: tuple[int, int],
+        progress: DownloadProgress,
+        aborted: threading.Event,
+    ) -> int:
+        """
+        Antwort ab dem Beginn von `byte_range` in die Datei schreiben
+
+        Returns:
+        --------
+        Position hinter dem zuletzt geschriebenen Byte
+        """
+        start, end = byte_range
+        position = start
+        for chunk in self.iter_chunks(response):
+            if aborted.is_set():
+                raise requests.RequestException("Anderes Segment fehlgeschlagen.")
+            if position + len(chunk) > end + 1:
+                raise requests.RequestException(
+                    f"Server liefert mehr als Segment {start}-{end} von"
+                    f" {response.url}."
+                )
+            if self.bandwidth_limiter is not None:
+                self.bandwidth_limiter.consume(len(chunk))
+            position = pwrite_all(fd, chunk, position)
+            progress.update(len(chunk))
+        return position
+
+    def iter_chunks(self, response: requests.Response) -> Iterator[memoryview]:
+        """
+        Antwort blockweise in einen wiederverwendeten Puffer lesen
+
+        Ohne Kodierung füllt `http.client` den Puffer direkt aus dem Socket,
+        sodass anders als bei `iter_content` kein Bytes-Objekt je Block
+        entsteht. Kodierte Antworten entpackt urllib3, dessen `readinto`
+        intern weiterhin je Block ein Bytes-Objekt anlegt und kopiert. Jeder
+        Block ist nur bis zum nächsten Schritt der Iteration gültig.
+        """
+        buffer = memoryview(bytearray(self.chunk_size))
+        raw = response.raw
+        if is_encoded(response) or raw._fp is None:
+            raw.decode_content = True
+            readinto = raw.readinto
+        else:
+            # `_fp` ist die Antwort von http.client. urllib3 bekommt vom
+            # Lesen nichts mit und gibt die Verbindung daher nicht selbst frei.
+            readinto = raw._fp.readinto
+        try:
+            while n_read := readinto(buffer):
+                yield buffer[:n_read]
+        except (
+            urllib3.exceptions.HTTPError,
+            http.client.HTTPException,
+            OSError,
+        ) as err:
+            # `iter_content` setzt diese Fehler ebenso um.
+            raise requests.ConnectionError(err) from err
+        # Vollständig gelesen, die Verbindung kann erneut genutzt werden.
+        raw.release_conn()
+
+    def download_to_part_file(self, url: str, part_file: Path) -> None:
+        """
+        Film in eine Teildatei herunterladen, bei Bedarf fortsetzen
+
+        Liegt von einem früheren Versuch schon eine Teildatei samt passenden
+        Angaben zum Download vor, wird nur der fehlende Rest per
+        Range-Request angefordert. Über `If-Range` liefert der Server den
+        ganzen Film neu, falls er sich seitdem geändert hat.
+
+        Anders als bei `download_segmented` wird kein Speicherplatz vorab
+        reserviert, denn beim Fortsetzen gibt die Größe der Teildatei an, ab
+        welchem Byte der Rest fehlt.
+
+        Raises:
+        -------
+        requests.RequestException, falls der Download fehlschlägt oder
+        unvollständig ist. Die Teildatei bleibt dann für einen weiteren
+        Versuch erhalten.
+        """
+        info_file = get_partial_download_file(part_file)
+        partial = PartialDownload.load(info_file, url)
+        offset = part_file.stat().st_size if part_file.exists() else 0
+        headers = get_resume_headers(partial, offset)
+
+        with self.session.get(
+            url, headers=headers, stream=True, timeout=self.timeout
+        ) as response:
+            if headers and is_already_complete(response, partial, offset):
+                logger.info(f"Teildatei {part_file} ist bereits vollständig.")
+                return
+            response.raise_for_status()
+            partial, offset = start_part_file(
+                url, response, info_file, partial if headers else None, offset
+            )
+            progress = DownloadProgress(
+                part_file.name, total=partial.content_length, done=offset
+            )
+            with part_file.open("ab" if offset > 0 else "wb") as fh:
+                for chunk in self.iter_chunks(response):
+                    if self.bandwidth_limiter is not None:
+                        self.bandwidth_limiter.consume(len(chunk))
+                    fh.write(chunk)
+                    progress.update(len(chunk))
+            progress.finish()
+
+        size = part_file.stat().st_size
+        if partial.content_length is not None and size != partial.content_length:
+            raise requests.RequestException(
+                f"Download von {url} unvollständig: {size} von"
+                f" {partial.content_length} Bytes erhalten."
+            )
+
+
+class PartialDownload(BaseModel):
+    """
+    Angaben zu einer Teildatei, um ihren Download fortsetzen zu können
+
+    Die Angaben stammen aus der Antwort, mit der der Download begonnen hat,
+    und liegen als JSON neben der Teildatei.
+    """
+
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_length: Optional[int] = None
+
+    @classmethod
+    def from_response(cls, url: str, response: requests.Response) -> PartialDownload:
+        """
+        Angaben aus der Antwort übernehmen, mit der der Download beginnt
+
+        Bei kodierter Übertragung, etwa mit gzip, beziehen sich Länge und
+        Byte-Bereiche auf die kodierten Daten, geschrieben werden aber die
+        dekodierten. Ein solcher Download wird daher weder auf Vollständigkeit
+        geprüft noch fortgesetzt.
+        """
+        if is_encoded(response):
+            return cls(url=url)
+        content_length = response.headers.get("Content-Length")
+        return cls(
+            url=url,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            content_length=None if content_length is None else int(content_length),
+        )
+
+    @classmethod
+    def load(cls, info_file: Path, url: str) -> Optional[PartialDownload]:
+        """Angaben lesen, sofern sie vorhanden sind und zur URL passen"""
+        try:
+            partial = cls.parse_file(info_file)
+        except (OSError, ValueError):
+            return None
+        return partial if partial.url == url else None
+
+    @property
+    def validator(self) -> Optional[str]:
+        """Wert für `If-Range`, ohne den nicht sicher fortgesetzt werden kann"""
+        # Schwache ETags sind für If-Range nicht zulässig.
+        if self.etag is not None and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+
+def get_part_file(target: Path) -> Path:
+    """Teildatei, in die ein Film bis zu seiner Vollständigkeit geladen wird"""
+    return target.with_name(target.name + ".part")
+
+
+def get_partial_download_file(part_file: Path) -> Path:
+    """Datei mit den Angaben zum Fortsetzen des Downloads einer Teildatei"""
+    return part_file.with_name(part_file.name + ".json")
+
+
+def preallocate(fd: int, size: int) -> None:
+    """
+    Speicherplatz für `size` Bytes einer Datei reservieren
+
+    Vermeidet eine stark fragmentierte Datei, wenn Segmente verstreut
+    geschrieben werden. Unterstützt das Dateisystem das nicht, bleibt es bei
+    einer Datei mit Lücken.
+    """
+    if not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as err:
+        if err.errno == errno.ENOSPC:
+            raise
+        logger.debug(f"Speicherplatz kann nicht reserviert werden: {err}")
+
+
+def get_byte_ranges(size: int, n_segments: int) -> list[tuple[int, int]]:
+    """Bytes `0` bis `size - 1` in gleich große Bereiche mit inklusivem Ende teilen"""
+    bounds = [size * n // n_segments for n in range(n_segments + 1)]
+    return [(start, end - 1) for start, end in zip(bounds, bounds[1:])]
+
+
+def check_segment_response(url: str, response: requests.Response, start: int) -> None:
+    """Prüfen, ob die Antwort das angeforderte Segment ab Byte `start` enthält"""
+    response.raise_for_status()
+    if get_range_start(response) != start:
+        raise requests.RequestException(
+            f"Server liefert {url} nicht ab Byte {start}, der Film hat sich"
+            " eventuell geändert."
+        )
+
+
+def pwrite_all(fd: int, data: memoryview, position: int) -> int:
+    """`data` vollständig ab `position` schreiben und die Position dahinter liefern"""
+    while data:
+        n_written = os.pwrite(fd, data, position)
+        data = data[n_written:]
+        position += n_written
+    return position
+
+
+def get_range_start(response: requests.Response) -> Optional[int]:
+    """Erstes Byte einer Teilantwort gemäß `Content-Range`"""
+    if response.status_code != 206:
+        return None
+    content_range = response.headers.get("Content-Range", "")
+    unit, _, byte_range = content_range.partition(" ")
+    try:
+        return int(byte_range.split("-")[0]) if unit == "bytes" else None
+    except ValueError:
+        return None
+
+
+def is_encoded(response: requests.Response) -> bool:
+    """Prüfen, ob der Inhalt der Antwort kodiert übertragen wird"""
+    return response.headers.get("Content-Encoding", "identity") != "identity"
+
+
+def get_resume_headers(
+    partial: Optional[PartialDownload], offset: int
+) -> dict[str, str]:
+    """Header, um eine Teildatei ab `offset` fortzusetzen, sonst keine"""
+    if partial is None or partial.validator is None or offset == 0:
+        return {}
+    return {"Range": f"bytes={offset}-", "If-Range": partial.validator}
+
 
+def is_already_complete(
+    response: requests.Response, partial: Optional[PartialDownload], offset: int
+) -> bool:
+    """Prüfen, ob der Server den Rest ablehnt, weil die Teildatei vollständig ist"""
+    return (
+        response.status_code == 416
+        and partial is not None
+        and partial.content_length == offset
+    )
 
-def get_url_fp(url):
+
+def start_part_file(
+    url: str,
+    response: requests.Response,
+    info_file: Path,
+    partial: Optional[PartialDownload],
+    offset: int,
+) -> tuple[PartialDownload, int]:
+    """
+    Teildatei fortsetzen, falls der Server den Rest ab `offset` liefert
+
+    Sonst beginnt der Download neu und die Angaben zum Fortsetzen werden aus
+    der Antwort übernommen.
+
+    Returns:
+    --------
+    Angaben zum Download und Position in der Teildatei, ab der die Antwort
+    geschrieben wird.
+    """
+    if partial is not None and get_range_start(response) == offset:
+        logger.info(f"Setze Download von {url} ab Byte {offset} fort.")
+        return partial, offset
+    partial = PartialDownload.from_response(url, response)
+    info_file.write_text(partial.json())
+    return partial, 0
+
+
+def get_url_fp(url: str, session: Optional[requests.Session] = None) -> HTTPResponse:
     """URL öffnen und Filepointer zurückgeben"""
-    return request.urlopen(url)
+    if session is None:
+        session = create_session()
+    response = session.get(url, stream=True, timeout=DEFAULT_TIMEOUT)
+    response.raise_for_status()
+    # Entpackt eventuelle Transportkodierungen wie gzip beim Lesen.
+    response.raw.decode_content = True
+    raw: HTTPResponse = response.raw
+    return raw
 
 
 def get_lzma_fp(url_fp) -> TextIO:
@@ -73,27 +659,138 @@ def get_lzma_fp(url_fp) -> TextIO:
     return ret
 
 
-def extract_entries_from_filmliste(fh: TextIO) -> Iterable[MovieListItem]:
+def extract_entries_from_filmliste(
+    fh: TextIO,
+    parser: FilmlistParser = FilmlistParser.RECORDS,
+    prefilter: Optional[RawEntryFilter] = None,
+    film_filter: Optional[FilmFilter] = None,
+    stats: Optional[IngestStats] = None,
+) -> Iterator[MovieListItem]:
     """
     Extrahiere einzelne Einträge aus MediathekViews Filmliste
 
     Diese Funktion nimmt eine IO-Objekt und extrahiert aus diesem einzelne
     Filmeinträge. Es wird darauf geachtet, dabei möglichst sparsam mit dem
     Arbeitsspeicher umzugehen.
+
+    Einträge, die `prefilter` verwirft, werden gar nicht erst in
+    `MovieListItem` umgewandelt. Filme, die `film_filter` verwirft, werden
+    nicht ausgeliefert. Falls angegeben, erhält `stats` Zähler und
+    Laufzeiten.
+    """
+    stats = IngestStats() if stats is None else stats
+    raw_entries = inherit_sender_thema(iter_raw_entries(fh, parser))
+    return convert_raw_entries(raw_entries, prefilter, film_filter, stats)
+
+
+def convert_raw_entries(
+    raw_entries: Iterable[list[str]],
+    prefilter: Optional[RawEntryFilter],
+    film_filter: Optional[FilmFilter],
+    stats: IngestStats,
+) -> Iterator[MovieListItem]:
+    """
+    Rohdaten gefiltert in Filme umwandeln
+
+    Die Zeit, die `raw_entries` für den nächsten Eintrag braucht, zählt als
+    Parsen. Da dies für jeden Eintrag der Filmliste läuft, werden Zähler und
+    Laufzeiten lokal gesammelt und erst am Ende in `stats` übernommen.
+    """
+    clock = time.perf_counter
+    n_seen = n_prefiltered = n_filtered = 0
+    parse_s = prefilter_s = build_s = filter_s = 0.0
+    try:
+        now, claimed_s = clock(), stats.claimed_s
+        for raw_entry in raw_entries:
+            start = clock()
+            # Beim Parsen nachgelesene Daten zählen bereits zum Entpacken.
+            parse_s += start - now - (stats.claimed_s - claimed_s)
+            claimed_s = stats.claimed_s
+            n_seen += 1
+            is_permitted = prefilter is None or prefilter.is_permitted(raw_entry)
+            now = clock()
+            prefilter_s += now - start
+            if not is_permitted:
+                n_prefiltered += 1
+                continue
+            film = MovieListItem.from_item_list(raw_entry)
+            built = clock()
+            build_s += built - now
+            is_permitted = film_filter is None or film_filter.is_permitted(film)
+            now = clock()
+            filter_s += now - built
+            if not is_permitted:
+                n_filtered += 1
+                continue
+            yield film
+            now, claimed_s = clock(), stats.claimed_s
+    finally:
+        stats.n_seen += n_seen
+        stats.n_prefiltered += n_prefiltered
+        stats.n_filtered += n_filtered
+        stats.add_time("parsen", parse_s)
+        stats.add_time("vorfiltern", prefilter_s)
+        stats.add_time("erzeugen", build_s)
+        stats.add_time("filtern", filter_s)
+
+
+def iter_raw_entries(fh: TextIO, parser: FilmlistParser) -> Iterator[list[str]]:
+    """
+    Extrahiere die Rohdaten einzelner Einträge aus MediathekViews Filmliste
+
+    Die Filmliste ist ein flaches JSON-Objekt, dessen Filmeinträge jeweils
+    eine Liste von Zeichenketten unter dem Schlüssel "X" sind.
+    """
+    if parser == FilmlistParser.EVENTS:
+        return _iter_raw_entries_from_events(fh)
+    return _iter_raw_entries_from_records(fh)
+
+
+def inherit_sender_thema(raw_entries: Iterable[list[str]]) -> Iterator[list[str]]:
+    """
+    Übernimm leere Felder Sender und Thema vom vorherigen Eintrag
+
+    Die Filmliste lässt Sender und Thema weg, wenn sie sich gegenüber dem
+    vorherigen Eintrag nicht ändern. Die Rohdaten werden dabei verändert.
     """
+    sender = thema = ""
+    for raw_entry in raw_entries:
+        if raw_entry[0]:
+            sender = raw_entry[0]
+        else:
+            raw_entry[0] = sender
+        if raw_entry[1]:
+            thema = raw_entry[1]
+        else:
+            raw_entry[1] = thema
+        yield raw_entry
+
+
+def _iter_raw_entries_from_events(fh: TextIO) -> Iterator[list[str]]:
+    """Setze Einträge aus den einzelnen JSON-Ereignissen von ijson zusammen"""
     stream = ijson.parse(fh)
     start_item = ("X", "start_array", None)
     end_item = ("X", "end_array", None)
     entry_has_started = False
-    last_entry: Optional[MovieListItem] = None
     for cur_item in stream:
         if cur_item == start_item:
             raw_entry: list[str] = []
             entry_has_started = True
         elif cur_item == end_item:
             entry_has_started = False
-            cur_entry = MovieListItem.from_item_list(raw_entry).update(last_entry)
-            last_entry = cur_entry
-            yield cur_entry
+            yield raw_entry
         elif entry_has_started:
             raw_entry.append(cur_item[-1])
+
+
+def _iter_raw_entries_from_records(fh: TextIO) -> Iterator[list[str]]:
+    """
+    Lasse ijson ganze Einträge erzeugen
+
+    Anders als `_iter_raw_entries_from_events` läuft hier keine
+    Python-Schleife je JSON-Token, da ijson die Listen vollständig aufbaut.
+    Mit dem C-Backend von ijson ist das deutlich schneller.
+    """
+    for key, value in ijson.kvitems(fh, ""):
+        if key == "X":
+            yield value
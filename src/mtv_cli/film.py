@@ -9,10 +9,39 @@
 from __future__ import annotations
 
 import datetime as dt
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
-from sqlite3 import Row
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Optional, Sequence
+
+# Die Filmliste enthält nur wenige tausend verschiedene Datums-, Zeit- und
+# Dauerangaben, die sich über hunderttausende Einträge wiederholen. Daher
+# werden die Ergebnisse zwischengespeichert.
+PARSE_CACHE_SIZE = 2**16
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_datum(datum: str) -> dt.date:
+    """Datum im Format TT.MM.JJJJ ohne `strptime` einlesen"""
+    if len(datum) != 10 or datum[2] != "." or datum[5] != ".":
+        return dt.datetime.strptime(datum, "%d.%m.%Y").date()
+    return dt.date(int(datum[6:10]), int(datum[3:5]), int(datum[0:2]))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_zeit(zeit: str) -> dt.time:
+    """Uhrzeit im Format HH:MM:SS ohne `strptime` einlesen"""
+    if len(zeit) != 8 or zeit[2] != ":" or zeit[5] != ":":
+        return dt.datetime.strptime(zeit, "%H:%M:%S").time()
+    return dt.time(int(zeit[0:2]), int(zeit[3:5]), int(zeit[6:8]))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_dauer(dauer: str) -> dt.timedelta:
+    """Dauer im Format HH:MM:SS einlesen"""
+    # Gültigkeit der Angabe wie bei `strptime` prüfen, d.h. höchstens 23:59:59
+    zeit = parse_zeit(dauer)
+    return dt.timedelta(hours=zeit.hour, minutes=zeit.minute, seconds=zeit.second)
 
 
 class MovieQuality(str, Enum):
@@ -23,6 +52,31 @@ class MovieQuality(str, Enum):
 
 @dataclass(frozen=True)
 class MovieListItem:
+    # Ohne `__dict__` je Instanz sinkt der Speicherbedarf großer
+    # Suchergebnisse deutlich. Die Liste muss zu den Feldern passen.
+    __slots__ = (
+        "sender",
+        "thema",
+        "titel",
+        "datum",
+        "zeit",
+        "dauer",
+        "groesse",
+        "beschreibung",
+        "url",
+        "website",
+        "url_untertitel",
+        "url_rtmp",
+        "url_klein",
+        "url_rtmp_klein",
+        "url_hd",
+        "url_rtmp_hd",
+        "datuml",
+        "url_history",
+        "geo",
+        "neu",
+    )
+
     sender: str
     thema: str
     titel: str
@@ -49,22 +103,9 @@ class MovieListItem:
 
     @classmethod
     def from_item_list(cls, raw_entry: list[str]) -> MovieListItem:
-        datum = (
-            None
-            if raw_entry[3] == ""
-            else dt.datetime.strptime(raw_entry[3], "%d.%m.%Y").date()
-        )
-        zeit = (
-            None
-            if raw_entry[4] == ""
-            else dt.datetime.strptime(raw_entry[4], "%H:%M:%S").time()
-        )
-        dauer_raw = (
-            None
-            if raw_entry[5] == ""
-            else dt.datetime.strptime(raw_entry[5], "%H:%M:%S")
-        )
-        dauer = None if dauer_raw is None else dauer_raw - dt.datetime(1900, 1, 1)
+        datum = None if raw_entry[3] == "" else parse_datum(raw_entry[3])
+        zeit = None if raw_entry[4] == "" else parse_zeit(raw_entry[4])
+        dauer = None if raw_entry[5] == "" else parse_dauer(raw_entry[5])
         return MovieListItem(
             sender=raw_entry[0],
             thema=raw_entry[1],
@@ -89,7 +130,7 @@ class MovieListItem:
         )
 
     @classmethod
-    def from_database_row(cls, row: Row) -> MovieListItem:
+    def from_database_row(cls, row: Sequence[Any]) -> MovieListItem:
         return MovieListItem(
             sender=row[0],
             thema=row[1],
@@ -110,23 +151,33 @@ class MovieListItem:
             datuml=row[16],
             url_history=row[17],
             geo=row[18],
-            neu=row[19],
+            neu=bool(row[19]),
         )
 
     def update(self, entry: Optional[MovieListItem]) -> MovieListItem:
         """
         Übernimm die Felder Sender und Thema, falls nötig
 
-        Falls eines der genannten Felder leer ist, wird es von `eintrag`
-        übernommen.
+        Falls eines der genannten Felder leer ist, wird es von `entry`
+        übernommen. Beim Einlesen der Filmliste geschieht das bereits auf den
+        Rohdaten, siehe `content_retrieval.inherit_sender_thema`.
         """
-        if entry is None:
+        if entry is None or (self.sender and self.thema):
             return self
-        new = asdict(self)
-        for attr in "sender", "thema":
-            if not new[attr]:
-                new[attr] = asdict(entry)[attr]
-        return type(self)(**new)
+        return replace(
+            self,
+            sender=self.sender or entry.sender,
+            thema=self.thema or entry.thema,
+        )
+
+    def __getstate__(self) -> tuple[Any, ...]:
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __setstate__(self, state: tuple[Any, ...]) -> None:
+        # Eingefrorene Dataclasses verbieten `setattr`, was das Standardverhalten
+        # von `pickle` für Klassen mit `__slots__` bricht.
+        for attr, value in zip(self.__slots__, state):
+            object.__setattr__(self, attr, value)
 
     def dauer_as_minutes(self) -> int:
         if self.dauer is None:
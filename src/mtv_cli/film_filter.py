@@ -80,3 +80,78 @@ def AgeDurationFilter(
     )
     has_date_filter = HasDateFilter()
     return CompositeFilter(filters=[has_date_filter, age_filter, duration_filter])
+
+
+class RawEntryFilter(BaseModel):
+    """
+    Vorfilter auf den Rohdaten eines Eintrags der Filmliste
+
+    Der Filter arbeitet direkt auf den Zeichenketten der Filmliste, sodass
+    verworfene Einträge nie in `MovieListItem` umgewandelt werden müssen.
+    Er verwirft nur Einträge, die auch der entsprechende Filter auf
+    `MovieListItem` verwerfen würde. Einträge mit unerwartetem Format werden
+    durchgelassen.
+    """
+
+    # Datumsgrenzen im sortierbaren Format JJJJMMTT
+    min_date: Optional[str] = None
+    max_date: Optional[str] = None
+    min_duration: MINUTES_T = 0
+    max_duration: Optional[MINUTES_T] = None
+
+    def is_permitted(self, raw_entry: list[str]) -> bool:
+        datum, dauer = raw_entry[3], raw_entry[5]
+        return self._is_date_permitted(datum) and self._is_duration_permitted(dauer)
+
+    def _is_date_permitted(self, datum: str) -> bool:
+        if datum == "":
+            return False
+        if len(datum) != 10 or datum[2] != "." or datum[5] != ".":
+            return True
+        sortable_date = datum[6:10] + datum[3:5] + datum[0:2]
+        if not _is_ascii_digits(sortable_date):
+            return True
+        if self.min_date is not None and sortable_date < self.min_date:
+            return False
+        if self.max_date is not None and sortable_date > self.max_date:
+            return False
+        return True
+
+    def _is_duration_permitted(self, dauer: str) -> bool:
+        if dauer == "":
+            # Siehe MovieListItem.dauer_as_minutes
+            duration = 24 * 60
+        elif len(dauer) != 8 or dauer[2] != ":" or dauer[5] != ":":
+            return True
+        elif not _is_ascii_digits(dauer[0:2] + dauer[3:5] + dauer[6:8]):
+            return True
+        else:
+            duration = 60 * int(dauer[0:2]) + int(dauer[3:5])
+        max_duration = duration if self.max_duration is None else self.max_duration
+        return self.min_duration <= duration <= max_duration
+
+
+def _is_ascii_digits(value: str) -> bool:
+    # `str.isdigit` allein ließe auch Ziffern anderer Schriften zu, die sich
+    # nicht wie JJJJMMTT sortieren.
+    return value.isascii() and value.isdigit()
+
+
+def RawAgeDurationFilter(
+    *,
+    min_age: Optional[DAYS_T] = None,
+    max_age: Optional[DAYS_T] = None,
+    today: Optional[dt.date] = None,
+    min_duration: MINUTES_T = 0,
+    max_duration: Optional[MINUTES_T] = None,
+) -> RawEntryFilter:
+    """Vorfilter mit denselben Parametern wie `AgeDurationFilter` erzeugen"""
+    today = dt.date.today() if today is None else today
+    min_date = None if max_age is None else today - dt.timedelta(days=max_age)
+    max_date = None if min_age is None else today - dt.timedelta(days=min_age)
+    return RawEntryFilter(
+        min_date=None if min_date is None else min_date.strftime("%Y%m%d"),
+        max_date=None if max_date is None else max_date.strftime("%Y%m%d"),
+        min_duration=min_duration,
+        max_duration=max_duration,
+    )
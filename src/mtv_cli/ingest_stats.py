@@ -0,0 +1,200 @@
+# Mediathekview auf der Kommandozeile
+#
+# Zähler und Laufzeiten beim Übernehmen der Filmliste
+#
+# Author: Bernhard Bablok, Max Görner
+# License: GPL3
+#
+# Website: https://github.com/bablokb/mtv_cli
+#
+
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, TextIO, TypeVar, cast
+
+from loguru import logger
+
+T = TypeVar("T")
+
+# Stufen der Verarbeitung mit ihrer Bezeichnung in der Zusammenfassung
+STAGES = {
+    "entpacken": "Laden und Entpacken",
+    "parsen": "JSON parsen",
+    "vorfiltern": "Vorfilter",
+    "erzeugen": "Filme erzeugen",
+    "filtern": "Filmfilter",
+    "schreiben": "SQLite",
+    "warten": "Warten auf Arbeitsprozesse",
+}
+
+
+def _zero_seconds() -> dict[str, float]:
+    return dict.fromkeys(STAGES, 0.0)
+
+
+@dataclass
+class IngestStats:
+    """
+    Zähler und Laufzeiten beim Übernehmen der Filmliste
+
+    Die Laufzeiten der Stufen schließen einander aus: Liest etwa der
+    JSON-Parser weitere Daten nach, zählt diese Zeit zum Entpacken und nicht
+    zum Parsen. Zu SQLite zählt alles, was beim Schreiben keiner anderen
+    Stufe zugeordnet ist, auch das Erzeugen der Datenbankzeilen.
+
+    Bei paralleler Verarbeitung werden die Laufzeiten aller Prozesse addiert,
+    sodass ihre Summe die Dauer des Laufs übersteigen kann.
+    """
+
+    n_seen: int = 0
+    n_prefiltered: int = 0
+    n_filtered: int = 0
+    n_written: int = 0
+    n_inserted: int = 0
+    n_bytes: int = 0
+    n_workers: int = 0
+    duration_s: float = 0.0
+    seconds: dict[str, float] = field(default_factory=_zero_seconds)
+    # Bereits einer Stufe zugeordnete Zeit, nur im eigenen Prozess gültig
+    claimed_s: float = field(default=0.0, repr=False)
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def n_rejected(self) -> int:
+        """An die Datenbank übergebene Zeilen, die sie nicht aufgenommen hat"""
+        return self.n_written - self.n_inserted
+
+    def add(self, other: IngestStats) -> None:
+        """Zähler und Laufzeiten eines anderen Prozesses übernehmen"""
+        self.n_seen += other.n_seen
+        self.n_prefiltered += other.n_prefiltered
+        self.n_filtered += other.n_filtered
+        self.n_written += other.n_written
+        self.n_inserted += other.n_inserted
+        self.n_bytes += other.n_bytes
+        for stage, seconds in other.seconds.items():
+            self.seconds[stage] += seconds
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """Anderweitig gemessene, exklusive Laufzeit einer Stufe übernehmen"""
+        self.seconds[stage] += seconds
+        self.claimed_s += seconds
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """Laufzeit des Blocks ohne die darin gemessenen Stufen zuordnen"""
+        start = time.perf_counter()
+        claimed_before = self.claimed_s
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add_time(stage, elapsed - (self.claimed_s - claimed_before))
+
+    def measure_iter(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        """Elemente weiterreichen und die Zeit für deren Erzeugung messen"""
+        item_iter = iter(items)
+        while True:
+            with self.timed(stage):
+                try:
+                    item = next(item_iter)
+                except StopIteration:
+                    return
+            yield item
+
+    def measure_reads(self, fh: TextIO) -> TextIO:
+        """Lesezugriffe auf `fh` als Entpacken messen und Bytes zählen"""
+        return cast(TextIO, _TimedReader(fh, self))
+
+    def measure_writes(
+        self, write: Callable[[Iterable[list[T]]], int], row_batches: Iterable[list[T]]
+    ) -> None:
+        """
+        Blöcke von Datenbankzeilen mit `write` schreiben
+
+        `write` muss die Anzahl tatsächlich aufgenommener Zeilen zurückgeben.
+        """
+
+        def counted_batches() -> Iterator[list[T]]:
+            for batch in row_batches:
+                self.n_written += len(batch)
+                yield batch
+
+        with self.timed("schreiben"):
+            self.n_inserted += write(counted_batches())
+
+    def finish(self) -> None:
+        self.duration_s = time.perf_counter() - self._start
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "n_seen": self.n_seen,
+                "n_prefiltered": self.n_prefiltered,
+                "n_filtered": self.n_filtered,
+                "n_written": self.n_written,
+                "n_inserted": self.n_inserted,
+                "n_rejected": self.n_rejected,
+                "n_bytes": self.n_bytes,
+                "n_workers": self.n_workers,
+                "duration_s": round(self.duration_s, 3),
+                "rows_per_s": round(self._per_second(self.n_written), 1),
+                "seconds": {
+                    stage: round(seconds, 3) for stage, seconds in self.seconds.items()
+                },
+            }
+        )
+
+    def log_summary(self) -> None:
+        logger.info(
+            f"Filmliste in {self.duration_s:.1f}s verarbeitet:"
+            f" {self.n_bytes / 2**20:.1f} MiB entpackt, {self.n_seen} Einträge,"
+            f" {self._per_second(self.n_seen):.0f} Einträge/s"
+        )
+        logger.info(
+            f"{self.n_prefiltered} vom Vorfilter und {self.n_filtered} vom"
+            f" Filmfilter verworfen, {self.n_written} Zeilen an die Datenbank"
+            f" übergeben ({self._per_second(self.n_written):.0f} Zeilen/s),"
+            f" davon {self.n_inserted} aufgenommen und {self.n_rejected}"
+            " abgelehnt oder bereits vorhanden"
+        )
+        for stage, label in STAGES.items():
+            seconds = self.seconds[stage]
+            if seconds > 0:
+                share = seconds / max(self.duration_s, 1e-9)
+                logger.info(f"  {label}: {seconds:.2f}s ({share:.0%})")
+        if self.n_workers > 0:
+            logger.info(
+                f"  Laufzeiten über {self.n_workers} Arbeitsprozesse, Lese- und"
+                " Schreibprozess summiert"
+            )
+
+    def _per_second(self, n: int) -> float:
+        return n / max(self.duration_s, 1e-9)
+
+
+class _TimedReader:
+    """Textdatei, deren `read` als Entpacken gemessen wird"""
+
+    def __init__(self, fh: TextIO, stats: IngestStats) -> None:
+        self._fh = fh
+        self._stats = stats
+        # Bei LZMA ist dies der entpackte Datenstrom, seine Position also die
+        # Anzahl entpackter Bytes.
+        self._buffer = getattr(fh, "buffer", None)
+
+    def read(self, size: int = -1) -> str:
+        with self._stats.timed("entpacken"):
+            data = self._fh.read(size)
+        if self._buffer is not None:
+            self._stats.n_bytes = self._buffer.tell()
+        else:
+            self._stats.n_bytes += len(data)
+        return data
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._fh, name)
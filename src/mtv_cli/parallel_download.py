@@ -0,0 +1,133 @@
+# Mediathekview auf der Kommandozeile
+#
+# Gleichzeitiger Download mehrerer Filme
+#
+# Author: Bernhard Bablok, Max Görner
+# License: GPL3
+#
+# Website: https://github.com/bablokb/mtv_cli
+#
+
+from __future__ import annotations
+
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from mtv_cli.content_retrieval import (
+    FilmDownloadFehlerhaft,
+    LowMemoryFileSystemDownloader,
+)
+from mtv_cli.film import MovieListItem, MovieQuality
+
+DEFAULT_N_TRANSFERS = 1
+DEFAULT_MAX_PER_HOST = 2
+
+
+def get_host(film: MovieListItem, quality: MovieQuality) -> str:
+    """Server, von dem der Film in der Qualität `quality` geladen wird"""
+    _, url = film.get_url(quality)
+    return urlsplit(url).netloc
+
+
+def download_parallel(
+    retriever: LowMemoryFileSystemDownloader,
+    filme: Iterable[MovieListItem],
+    n_transfers: int = DEFAULT_N_TRANSFERS,
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+) -> Iterator[tuple[MovieListItem, bool]]:
+    """
+    Mehrere Filme gleichzeitig herunterladen
+
+    Es laufen höchstens `n_transfers` Downloads gleichzeitig, davon höchstens
+    `max_per_host` vom selben Server. Filme, deren Server ausgelastet ist,
+    werden übersprungen, bis dort ein Download endet. Ansonsten werden die
+    Filme in der gegebenen Reihenfolge begonnen.
+
+    Returns:
+    --------
+    Die Filme in der Reihenfolge, in der ihr Download endet, jeweils mit der
+    Angabe, ob er erfolgreich war. Da die Ergebnisse im aufrufenden Thread
+    ausgeliefert werden, kann dieser die Filmdatenbank direkt aktualisieren.
+
+    Raises:
+    -------
+    Fehler außer `FilmDownloadFehlerhaft` werden weitergereicht. Vorher
+    werden keine neuen Downloads mehr begonnen und die Ergebnisse der
+    laufenden Downloads noch ausgeliefert.
+    """
+    scheduler = _DownloadScheduler(retriever, list(filme), n_transfers, max_per_host)
+    with ThreadPoolExecutor(
+        max_workers=n_transfers, thread_name_prefix="mtv-cli-download"
+    ) as executor:
+        while scheduler.has_work():
+            scheduler.start_downloads(executor)
+            yield from scheduler.collect_finished()
+    if scheduler.error is not None:
+        raise scheduler.error
+
+
+class _DownloadScheduler:
+    """Zustand von `download_parallel`: wartende und laufende Downloads"""
+
+    def __init__(
+        self,
+        retriever: LowMemoryFileSystemDownloader,
+        pending: list[MovieListItem],
+        n_transfers: int,
+        max_per_host: int,
+    ) -> None:
+        self.retriever = retriever
+        self.pending = pending
+        self.n_transfers = n_transfers
+        self.max_per_host = max_per_host
+        self.per_host: Counter[str] = Counter()
+        self.running: dict[Future[None], MovieListItem] = {}
+        self.error: Optional[BaseException] = None
+
+    def has_work(self) -> bool:
+        return bool(self.running) or (bool(self.pending) and self.error is None)
+
+    def start_downloads(self, executor: ThreadPoolExecutor) -> None:
+        """Wartende Filme beginnen, soweit freie Plätze und Server es erlauben"""
+        if self.error is not None:
+            return
+        for film in list(self.pending):
+            if len(self.running) >= self.n_transfers:
+                return
+            host = self.get_host(film)
+            if self.per_host[host] >= self.max_per_host:
+                continue
+            logger.info(f"About to download {film}.")
+            self.pending.remove(film)
+            self.per_host[host] += 1
+            future = executor.submit(self.retriever.download_film, film)
+            self.running[future] = film
+
+    def collect_finished(self) -> Iterator[tuple[MovieListItem, bool]]:
+        """Auf mindestens einen Download warten und alle beendeten ausliefern"""
+        done, _ = wait(self.running, return_when=FIRST_COMPLETED)
+        for future in done:
+            film = self.running.pop(future)
+            self.per_host[self.get_host(film)] -= 1
+            is_success = self.get_result(future, film)
+            if is_success is not None:
+                yield film, is_success
+
+    def get_result(self, future: Future[None], film: MovieListItem) -> Optional[bool]:
+        """Erfolg des Downloads, oder None, falls er unerwartet abgebrochen ist"""
+        try:
+            future.result()
+        except FilmDownloadFehlerhaft:
+            return False
+        except Exception as e:
+            logger.error(f"Download des Films {film} ist abgebrochen!")
+            self.error = self.error or e
+            return None
+        return True
+
+    def get_host(self, film: MovieListItem) -> str:
+        return get_host(film, self.retriever.quality)
@@ -0,0 +1,232 @@
+# Mediathekview auf der Kommandozeile
+#
+# Parallele Verarbeitung der Filmliste auf mehreren Prozessen
+#
+# Author: Bernhard Bablok, Max Görner
+# License: GPL3
+#
+# Website: https://github.com/bablokb/mtv_cli
+#
+
+from __future__ import annotations
+
+import multiprocessing as mp
+from functools import partial
+from itertools import islice
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from queue import Full
+from typing import Any, Iterable, Iterator, Optional, TextIO
+
+from loguru import logger
+
+from mtv_cli.content_retrieval import (
+    FilmlistParser,
+    convert_raw_entries,
+    inherit_sender_thema,
+    iter_raw_entries,
+)
+from mtv_cli.film_filter import FilmFilter, RawEntryFilter
+from mtv_cli.ingest_stats import IngestStats
+from mtv_cli.storage_backend import FilmDB, FilmRow, UpdateMode
+
+# Wartezeit, nach der blockierende Queue-Operationen prüfen, ob die übrigen
+# Prozesse der Pipeline noch leben
+POLL_INTERVAL_S = 1.0
+
+
+class ParallelIngestFehlerhaft(RuntimeError):
+    pass
+
+
+def ingest_parallel(
+    fh: TextIO,
+    parser: FilmlistParser,
+    prefilter: RawEntryFilter,
+    film_filter: FilmFilter,
+    filmDB: FilmDB,
+    mode: UpdateMode,
+    n_workers: int,
+    stats: Optional[IngestStats] = None,
+) -> None:
+    """
+    Filmliste mit mehreren Prozessen in die Filmdatenbank übernehmen
+
+    Der aufrufende Prozess entpackt die Filmliste, teilt sie in Einträge auf
+    und ergänzt fehlende Sender und Themen. Blöcke von Rohdaten gehen über
+    eine beschränkte Queue an `n_workers` Prozesse, die daraus mit
+    `prefilter` und `film_filter` gefilterte Datenbankzeilen erzeugen. Ein
+    einzelner Schreibprozess besitzt die Verbindung zur Datenbank. Da alle
+    Queues beschränkt sind, bleibt der Speicherbedarf unabhängig von der
+    Größe der Filmliste.
+
+    Die Reihenfolge der Filme in der Datenbank kann von der Filmliste
+    abweichen. Falls angegeben, erhält `stats` die Zähler und Laufzeiten
+    aller Prozesse.
+
+    Raises:
+    -------
+    ParallelIngestFehlerhaft, falls einer der Prozesse fehlschlägt. Die
+    bisherige Filmliste bleibt dann erhalten.
+    """
+    max_queue_size = 2 * n_workers
+    raw_queue: mp.Queue[Optional[list[list[str]]]] = mp.Queue(max_queue_size)
+    row_queue: mp.Queue[Optional[tuple[list[FilmRow], IngestStats]]] = mp.Queue(
+        max_queue_size
+    )
+    stats_queue: mp.Queue[IngestStats] = mp.Queue(1)
+    processes = _start_processes(
+        raw_queue,
+        row_queue,
+        stats_queue,
+        prefilter,
+        film_filter,
+        filmDB,
+        mode,
+        n_workers,
+    )
+
+    stats = IngestStats() if stats is None else stats
+    stats.n_workers = n_workers
+    try:
+        raw_entries = inherit_sender_thema(iter_raw_entries(fh, parser))
+        chunks = _chunked(raw_entries, filmDB.batch_size)
+        _feed_workers(chunks, raw_queue, processes, n_workers, stats)
+        _wait_for(processes)
+        stats.add(stats_queue.get(timeout=POLL_INTERVAL_S))
+    except BaseException:
+        _abort(processes, [raw_queue, row_queue, stats_queue])
+        raise
+
+
+def _start_processes(
+    raw_queue: mp.Queue[Optional[list[list[str]]]],
+    row_queue: mp.Queue[Optional[tuple[list[FilmRow], IngestStats]]],
+    stats_queue: mp.Queue[IngestStats],
+    prefilter: RawEntryFilter,
+    film_filter: FilmFilter,
+    filmDB: FilmDB,
+    mode: UpdateMode,
+    n_workers: int,
+) -> list[BaseProcess]:
+    """Arbeitsprozesse und Schreibprozess starten, Letzteren am Ende der Liste"""
+    workers = [
+        mp.Process(
+            target=_convert_entries,
+            args=(raw_queue, row_queue, prefilter, film_filter),
+            name=f"mtv-cli-umwandlung-{n}",
+        )
+        for n in range(n_workers)
+    ]
+    writer = mp.Process(
+        target=_write_rows,
+        args=(filmDB, mode, row_queue, stats_queue, n_workers),
+        name="mtv-cli-schreiben",
+    )
+    processes: list[BaseProcess] = [*workers, writer]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def _feed_workers(
+    chunks: Iterable[list[list[str]]],
+    raw_queue: mp.Queue[Optional[list[list[str]]]],
+    processes: list[BaseProcess],
+    n_workers: int,
+    stats: IngestStats,
+) -> None:
+    """Rohdaten verteilen und danach jedem Arbeitsprozess das Ende melden"""
+    for chunk in stats.measure_iter("parsen", chunks):
+        with stats.timed("warten"):
+            _put(raw_queue, chunk, processes)
+    for _ in range(n_workers):
+        _put(raw_queue, None, processes)
+
+
+def _abort(processes: list[BaseProcess], queues: list[mp.Queue[Any]]) -> None:
+    for process in processes:
+        process.terminate()
+    # Ohne lesende Prozesse würde das Beenden sonst blockieren.
+    for queue in queues:
+        queue.cancel_join_thread()
+
+
+def _chunked(raw_entries: Iterable[list[str]], size: int) -> Iterator[list[list[str]]]:
+    entry_iter = iter(raw_entries)
+    while True:
+        chunk = list(islice(entry_iter, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _put(queue: mp.Queue[Any], item: Any, consumers: list[BaseProcess]) -> None:
+    """Element in Queue legen, ohne bei ausgefallenen Prozessen zu hängen"""
+    while True:
+        try:
+            queue.put(item, timeout=POLL_INTERVAL_S)
+            return
+        except Full:
+            _raise_on_failure(consumers)
+
+
+def _wait_for(processes: list[BaseProcess]) -> None:
+    running = list(processes)
+    while running:
+        wait([process.sentinel for process in running], timeout=POLL_INTERVAL_S)
+        _raise_on_failure(processes)
+        running = [process for process in running if process.is_alive()]
+
+
+def _raise_on_failure(processes: list[BaseProcess]) -> None:
+    for process in processes:
+        if process.exitcode not in (None, 0):
+            raise ParallelIngestFehlerhaft(
+                f"Prozess {process.name} ist mit Code {process.exitcode} abgebrochen!"
+            )
+
+
+def _convert_entries(
+    raw_queue: mp.Queue[Optional[list[list[str]]]],
+    row_queue: mp.Queue[Optional[tuple[list[FilmRow], IngestStats]]],
+    prefilter: RawEntryFilter,
+    film_filter: FilmFilter,
+) -> None:
+    """Rohdaten in gefilterte Datenbankzeilen umwandeln"""
+    while True:
+        chunk = raw_queue.get()
+        if chunk is None:
+            row_queue.put(None)
+            return
+        chunk_stats = IngestStats()
+        films = convert_raw_entries(chunk, prefilter, film_filter, chunk_stats)
+        rows = [FilmDB.as_row(film) for film in films]
+        row_queue.put((rows, chunk_stats))
+
+
+def _write_rows(
+    filmDB: FilmDB,
+    mode: UpdateMode,
+    row_queue: mp.Queue[Optional[tuple[list[FilmRow], IngestStats]]],
+    stats_queue: mp.Queue[IngestStats],
+    n_workers: int,
+) -> None:
+    stats = IngestStats()
+
+    def row_batches() -> Iterator[list[FilmRow]]:
+        n_finished = 0
+        while n_finished < n_workers:
+            with stats.timed("warten"):
+                item = row_queue.get()
+            if item is None:
+                n_finished += 1
+                continue
+            rows, chunk_stats = item
+            stats.add(chunk_stats)
+            if rows:
+                yield rows
+
+    stats.measure_writes(partial(filmDB.write_rows, mode=mode), row_batches())
+    logger.info(f"{filmDB.total} Filme in Filmdatenbank übernommen")
+    stats_queue.put(stats)
@@ -0,0 +1,373 @@
+# Mediathekview auf der Kommandozeile
+#
+# Übersetzung von Suchausdrücken in parametrisierte SQL-Abfragen
+#
+# Author: Bernhard Bablok, Max Görner
+# License: GPL3
+#
+# Website: https://github.com/bablokb/mtv_cli
+#
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Optional, Union
+
+# Felder, die mit `feld:wert` durchsucht werden können, samt Spaltenname
+SEARCH_FIELDS = {
+    "sender": "Sender",
+    "thema": "Thema",
+    "titel": "Titel",
+    "beschreibung": "Beschreibung",
+}
+# Felder, die über den Volltextindex durchsucht werden, falls er existiert
+FULLTEXT_FIELDS = {"titel", "thema", "beschreibung"}
+DATE_OPERATORS = ("<=", ">=", "<", ">", "=")
+
+OPERATORS = {"und": "AND", "and": "AND", "oder": "OR", "or": "OR"}
+OPEN_GROUP = "("
+CLOSE_GROUP = ")"
+
+# Aktionen, die rohe Abfragen ausführen dürfen. Alle anderen werden abgelehnt.
+READ_ONLY_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+QUERY_CACHE_SIZE = 256
+
+# SQL je Form eines Suchbegriffs. Die Platzhalter {0}, {1}, ... stehen für
+# die übrigen Einträge der Form, etwa die Spalte oder den Vergleichsoperator.
+TERM_SQL = {
+    "like_any": "(Sender LIKE ? ESCAPE '\\' OR Thema LIKE ? ESCAPE '\\'"
+    " OR Titel LIKE ? ESCAPE '\\' OR Beschreibung LIKE ? ESCAPE '\\')",
+    "like": "({0} LIKE ? ESCAPE '\\')",
+    # Passt zur Sortierfolge des Index `sender_datum_index`
+    "equals": "({0} = ? COLLATE NOCASE)",
+    "match": "(rowid IN (SELECT rowid FROM {fulltext_table}"
+    " WHERE {fulltext_table} MATCH ?))",
+    # Die Parameter sind ISO-Daten wie in der Spalte Datum. So bleibt der
+    # Vergleich über den Index auflösbar.
+    "datum": "(Datum {0} ?)",
+    "datum_range": "(Datum >= ? AND Datum <= ?)",
+}
+
+Params = tuple[Any, ...]
+
+
+class SuchausdruckFehlerhaft(ValueError):
+    pass
+
+
+class _UnerwartetesToken(SuchausdruckFehlerhaft):
+    """Token an Position `pos` passt nicht an seine Stelle im Suchausdruck"""
+
+    def __init__(self, pos: int) -> None:
+        super().__init__(f"Unerwartetes Token an Position {pos}")
+        self.pos = pos
+
+
+@dataclass(frozen=True)
+class Term:
+    """
+    Einzelner Suchbegriff
+
+    `shape` legt die erzeugte SQL-Bedingung fest, `params` enthält die daran
+    gebundenen Werte. Begriffe gleicher Form teilen sich dieselbe SQL.
+    """
+
+    shape: tuple[str, ...]
+    params: Params
+
+
+@dataclass(frozen=True)
+class Leaf:
+    shape: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class BoolOp:
+    op: str
+    children: tuple[Node, ...]
+
+
+Node = Union[Leaf, BoolOp]
+Token = Union[str, Term]
+# Operatoren und Klammern bleiben Zeichenketten, Suchbegriffe werden zu ihrer
+# Form `Term.shape`.
+Shape = Union[str, tuple[str, ...]]
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    sql: str
+    params: Params
+    # Rohe Abfragen dürfen nur mit `read_only_authorizer` ausgeführt werden.
+    is_raw: bool = False
+
+    def paginate(self, limit: Optional[int], offset: int) -> CompiledQuery:
+        """
+        Abfrage auf `limit` Treffer ab dem `offset`-ten Treffer beschränken
+
+        Die Reihenfolge der Treffer ist die, in der SQLite sie liefert. Sie
+        ist stabil, solange sich die Filmliste nicht ändert. Auf ein ORDER BY
+        wird verzichtet, damit SQLite weiterhin die passenden Indizes nutzt.
+        """
+        if limit is None and offset == 0:
+            return self
+        # Ein negatives LIMIT bedeutet in SQLite "ohne Begrenzung".
+        limit = -1 if limit is None else limit
+        sql = f"SELECT * FROM ({self.sql})" if self.is_raw else self.sql
+        return CompiledQuery(
+            f"{sql} LIMIT ? OFFSET ?", (*self.params, limit, offset), self.is_raw
+        )
+
+
+def compile_query(
+    suche: list[str], table: str, fulltext_table: Optional[str] = None
+) -> CompiledQuery:
+    """
+    Suchausdruck in SQL-Abfrage mit gebundenen Parametern übersetzen
+
+    Beginnt der Suchausdruck mit `select`, wird er unverändert als rohe
+    Abfrage übernommen. Ist `fulltext_table` angegeben, werden Volltextsuche
+    und die Suche in Titel, Thema und Beschreibung über diesen Index
+    abgewickelt.
+
+    Raises:
+    -------
+    SuchausdruckFehlerhaft, falls der Suchausdruck ungültig ist.
+    """
+    if len(suche) == 0:
+        return CompiledQuery(f"SELECT * FROM {table}", ())
+    if suche[0].lower().startswith("select"):
+        return CompiledQuery(" ".join(suche), (), is_raw=True)
+
+    use_fulltext = fulltext_table is not None
+    tokens, texts = zip(
+        *with_implicit_operators(zip(tokenize(suche, use_fulltext), suche))
+    )
+    shapes = tuple(token if isinstance(token, str) else token.shape for token in tokens)
+    params = tuple(
+        param for token in tokens if isinstance(token, Term) for param in token.params
+    )
+    try:
+        where_clause = compile_where(shapes, fulltext_table)
+    except _UnerwartetesToken as err:
+        raise SuchausdruckFehlerhaft(
+            f"Unerwartetes '{texts[err.pos]}' im Suchausdruck"
+        ) from None
+    return CompiledQuery(f"SELECT * FROM {table} WHERE {where_clause}", params)
+
+
+def read_only_authorizer(action: int, *args: Any) -> int:
+    """Authorizer für `sqlite3.Connection.set_authorizer`, der nur Lesen erlaubt"""
+    if action in READ_ONLY_ACTIONS:
+        return sqlite3.SQLITE_OK
+    # Diese Zugriffe stammen vom Einrichten eines FTS5-Index und verändern
+    # nichts, da eine Abfrage das Schema nicht schreiben kann.
+    if action == sqlite3.SQLITE_UPDATE and args[0] == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and args[:2] == ("data_version", None):
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def permit_all_authorizer(action: int, *args: Any) -> int:
+    """Authorizer, der alles erlaubt"""
+    return sqlite3.SQLITE_OK
+
+
+def reset_authorizer(db: sqlite3.Connection) -> None:
+    """Authorizer einer Verbindung entfernen"""
+    if sys.version_info >= (3, 11):
+        db.set_authorizer(None)
+    else:
+        # Vorher verbietet der mit `None` gesetzte Authorizer jede Anweisung.
+        db.set_authorizer(permit_all_authorizer)
+
+
+def tokenize(suche: list[str], use_fulltext: bool) -> Iterator[Token]:
+    for token in suche:
+        if token in OPERATORS:
+            yield OPERATORS[token]
+        elif token in (OPEN_GROUP, CLOSE_GROUP):
+            yield token
+        elif ":" in token:
+            key, value = token.split(":", 1)
+            yield parse_field_term(key.lower(), value, use_fulltext)
+        elif use_fulltext and has_word(token):
+            yield Term(("match", ""), (as_fulltext_phrase(token),))
+        else:
+            yield Term(("like_any",), 4 * (as_like_pattern(token),))
+
+
+def parse_field_term(key: str, value: str, use_fulltext: bool) -> Term:
+    if key == "datum":
+        return parse_date_term(value)
+    if key not in SEARCH_FIELDS:
+        raise SuchausdruckFehlerhaft(f"Unbekanntes Suchfeld: {key}")
+    column = SEARCH_FIELDS[key]
+    if value.startswith("="):
+        # Exakte Suche ohne Berücksichtigung von Groß-/Kleinschreibung
+        return Term(("equals", column), (value[1:],))
+    if use_fulltext and key in FULLTEXT_FIELDS and has_word(value):
+        return Term(("match", column), (f"{column} : {as_fulltext_phrase(value)}",))
+    return Term(("like", column), (as_like_pattern(value),))
+
+
+def parse_date_term(value: str) -> Term:
+    """
+    Datumsbedingung einlesen
+
+    Unterstützt werden `datum:TT.MM.JJ`, `datum:VON-BIS` und die Operatoren
+    aus `DATE_OPERATORS`, zum Beispiel `datum:>=TT.MM.JJJJ`.
+    """
+    for op in DATE_OPERATORS:
+        if value.startswith(op):
+            return Term(("datum", op), (iso_date(value.removeprefix(op)),))
+    if "-" in value:
+        start, end = value.split("-", 1)
+        return Term(("datum_range",), (iso_date(start), iso_date(end)))
+    return Term(("datum", "="), (iso_date(value),))
+
+
+def iso_date(datum: str) -> str:
+    """Deutsches Datum in ISO-Datum umwandeln"""
+    parts = datum.split(".")
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        raise SuchausdruckFehlerhaft(f"Ungültiges Datum: {datum}")
+    day, month, year = parts
+    year = ("20" if len(year) == 2 else "") + year
+    return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+
+
+def as_like_pattern(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def as_fulltext_phrase(value: str) -> str:
+    # Als FTS5-Zeichenkette sind alle Sonderzeichen ohne Bedeutung. Wie bei
+    # LIKE werden auch Wörter gefunden, die mit `value` beginnen.
+    return '"' + value.replace('"', '""') + '"*'
+
+
+def has_word(value: str) -> bool:
+    """Prüfen, ob `value` mindestens ein Wort für den Volltextindex enthält"""
+    return any(char.isalnum() for char in value)
+
+
+def with_implicit_operators(
+    tokens: Iterable[tuple[Token, str]]
+) -> Iterator[tuple[Token, str]]:
+    """
+    Fehlende Operatoren ergänzen
+
+    Jedes Token steht neben dem Text, aus dem es hervorgeht. Vor generischen
+    Suchbegriffen wird "oder" ergänzt, vor der Suche in Feldern und vor
+    Klammern "und".
+    """
+    previous: Optional[Token] = None
+    for token, text in tokens:
+        if ends_operand(previous) and starts_operand(token):
+            is_free_text = isinstance(token, Term) and token.shape in (
+                ("like_any",),
+                ("match", ""),
+            )
+            yield ("OR", "oder") if is_free_text else ("AND", "und")
+        yield token, text
+        previous = token
+
+
+def ends_operand(token: Optional[Token]) -> bool:
+    return isinstance(token, Term) or token == CLOSE_GROUP
+
+
+def starts_operand(token: Token) -> bool:
+    return isinstance(token, Term) or token == OPEN_GROUP
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def compile_where(shapes: tuple[Shape, ...], fulltext_table: Optional[str]) -> str:
+    """
+    WHERE-Bedingung für eine Folge von Operatoren und Begriffsformen erzeugen
+
+    Da nur die Form der Suchbegriffe eingeht, nicht aber deren Werte, liefern
+    wiederkehrende Suchen dieselbe SQL. So kann auch `sqlite3` die
+    vorbereitete Abfrage wiederverwenden.
+    """
+    parser = _Parser(list(shapes))
+    tree = parser.parse()
+    return to_sql(tree, fulltext_table)
+
+
+class _Parser:
+    """
+    Rekursiver Abstieg über Operatoren und Klammern
+
+    Wie in SQL bindet "und" stärker als "oder". Fehler an einem Token geben
+    dessen Position an, denn die Formen enthalten nicht mehr den
+    eingegebenen Text.
+    """
+
+    def __init__(self, shapes: list[Shape]) -> None:
+        self.shapes = shapes
+        self.pos = 0
+
+    def parse(self) -> Node:
+        node = self.parse_or()
+        if self.pos != len(self.shapes):
+            raise _UnerwartetesToken(self.pos)
+        return node
+
+    def parse_or(self) -> Node:
+        children = [self.parse_and()]
+        while self.peek() == "OR":
+            self.pos += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else BoolOp("OR", tuple(children))
+
+    def parse_and(self) -> Node:
+        children = [self.parse_operand()]
+        while self.peek() == "AND":
+            self.pos += 1
+            children.append(self.parse_operand())
+        return children[0] if len(children) == 1 else BoolOp("AND", tuple(children))
+
+    def parse_operand(self) -> Node:
+        shape = self.peek()
+        if shape is None:
+            raise SuchausdruckFehlerhaft("Suchausdruck endet unerwartet")
+        self.pos += 1
+        if shape == OPEN_GROUP:
+            node = self.parse_or()
+            if self.peek() != CLOSE_GROUP:
+                raise SuchausdruckFehlerhaft("Schließende Klammer fehlt")
+            self.pos += 1
+            return node
+        if isinstance(shape, str):
+            raise _UnerwartetesToken(self.pos - 1)
+        return Leaf(shape)
+
+    def peek(self) -> Optional[Shape]:
+        if self.pos < len(self.shapes):
+            return self.shapes[self.pos]
+        return None
+
+
+def to_sql(node: Node, fulltext_table: Optional[str]) -> str:
+    if isinstance(node, BoolOp):
+        joined = f" {node.op} ".join(
+            to_sql(child, fulltext_table) for child in node.children
+        )
+        return f"({joined})"
+    kind, *args = node.shape
+    if kind in TERM_SQL:
+        return TERM_SQL[kind].format(*args, fulltext_table=fulltext_table)
+    raise AssertionError(f"Unbekannte Form eines Suchbegriffs: {node.shape}")
@@ -12,16 +12,28 @@ from __future__ import annotations
 
 import datetime as dt
 import hashlib
+import os
 import sqlite3
-from dataclasses import asdict, dataclass, field
+import threading
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import lru_cache
+from itertools import islice
 from multiprocessing import Lock
 from multiprocessing.synchronize import Lock as Lock_T
 from pathlib import Path
-from typing import Iterable, Literal, Optional, Union
+from typing import Any, Iterable, Iterator, Literal, Optional, Tuple, Union
 
 from loguru import logger
 
 from mtv_cli.film import MovieListItem
+from mtv_cli.search_query import (
+    CompiledQuery,
+    SuchausdruckFehlerhaft,
+    compile_query,
+    read_only_authorizer,
+    reset_authorizer,
+)
 
 # Bedeutung der Status-Codes:
 # V - Vorgemerkt
@@ -29,6 +41,77 @@ from mtv_cli.film import MovieListItem
 # K - Komplett
 DownloadStatus = Union[Literal["V"], Literal["F"], Literal["K"]]
 
+FilmRow = Tuple[Any, ...]
+
+
+class UpdateMode(str, Enum):
+    FULL = "full"
+    INCREMENTAL = "incremental"
+    DIFF = "diff"
+
+
+DEFAULT_BATCH_SIZE = 1000
+STATEMENT_CACHE_SIZE = 256
+BULK_LOAD_CACHE_SIZE_KIB = 32 * 1024
+
+# Indizes der Tabelle Filme mit Name und indizierten Spalten. Der
+# zusammengesetzte Index bedient Suchen wie "Sender X der letzten N Tage".
+FILM_INDEXES = {
+    "id_index": "_id",
+    "sender_index": "sender",
+    "thema_index": "thema",
+    "datum_index": "Datum",
+    "datuml_index": "DatumL",
+    "sender_datum_index": "Sender COLLATE NOCASE, Datum",
+}
+
+# Spalten des Volltextindex. Die Tokenisierung ignoriert Groß- und
+# Kleinschreibung sowie diakritische Zeichen, sodass "Ärzte" auch "arzte"
+# findet.
+FULLTEXT_COLUMNS = ("Sender", "Thema", "Titel", "Beschreibung")
+FULLTEXT_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Deklarierte Typen der Spalten, deren Werte über die unten registrierten
+# Konverter gelesen werden. Ältere Datenbanken nutzten "text" und "integer".
+FILM_COLUMN_TYPES = {"Zeit": "time", "Dauer": "duration"}
+
+
+@lru_cache(maxsize=24 * 60)
+def convert_zeit(value: bytes) -> dt.time:
+    """Uhrzeit im Format HH:MM aus der Datenbank lesen"""
+    return dt.time(int(value[0:2]), int(value[3:5]))
+
+
+def convert_dauer(value: bytes) -> dt.timedelta:
+    """Dauer in Minuten aus der Datenbank lesen"""
+    return dt.timedelta(minutes=int(value))
+
+
+def adapt_zeit(zeit: dt.time) -> str:
+    return zeit.strftime("%H:%M")
+
+
+sqlite3.register_adapter(dt.time, adapt_zeit)
+sqlite3.register_converter("time", convert_zeit)
+sqlite3.register_converter("duration", convert_dauer)
+
+
+def film_row_factory(cursor: sqlite3.Cursor, row: FilmRow) -> MovieListItem:
+    """
+    Zeile der Tabelle Filme in Film umwandeln
+
+    Die Spalten werden über ihre Position zugeordnet. Die Konverter haben
+    Zeit und Dauer bereits umgewandelt, die ID in der letzten Spalte entfällt.
+    """
+    return MovieListItem.from_database_row(row)
+
+
+def legacy_film_row_factory(cursor: sqlite3.Cursor, row: FilmRow) -> MovieListItem:
+    """Wie `film_row_factory`, aber für Tabellen ohne Konverter für Zeit und Dauer"""
+    zeit = None if row[4] is None else convert_zeit(row[4].encode())
+    dauer = None if row[5] is None else dt.timedelta(minutes=row[5])
+    return MovieListItem.from_database_row((*row[:4], zeit, dauer, *row[6:]))
+
 
 @dataclass
 class NoopDatabase:
@@ -57,32 +140,82 @@ class FilmDB:
     downloadsdb: str = "downloads"
     filmdb: str = "filme"
     total: int = 0
+    batch_size: int = DEFAULT_BATCH_SIZE
+    # Verbindung je Thread und Prozess, siehe `db`
+    _local: threading.local = field(
+        default_factory=threading.local, init=False, repr=False, compare=False
+    )
 
-    def open(self):
-        """Datenbank öffnen und Cursor zurückgeben"""
-        self.db = sqlite3.connect(self.dbfile, detect_types=sqlite3.PARSE_DECLTYPES)
-        self.db.row_factory = sqlite3.Row
-        self.cursor = self.db.cursor()
-        return self.cursor
+    def __enter__(self) -> FilmDB:
+        return self
 
-    def close(self):
-        """Datenbank schließen"""
-        self.db.close()
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
 
-    def create_filmtable(self):
-        """Tabelle Filme löschen und neu erzeugen"""
-        self.db = sqlite3.connect(self.dbfile, detect_types=sqlite3.PARSE_DECLTYPES)
-        self.cursor = self.db.cursor()
+    def __getstate__(self) -> dict[str, Any]:
+        # Verbindungen lassen sich nicht an andere Prozesse übergeben.
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
 
-        self.cursor.execute(f"DROP TABLE IF EXISTS {self.filmdb}")
-        self.cursor.execute(
-            f"""CREATE TABLE {self.filmdb}
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """
+        Dauerhafte Verbindung zur Datenbank
+
+        Jeder Thread erhält eine eigene Verbindung, die bis zum Aufruf von
+        `close` bestehen bleibt. So entfallen Verbindungsaufbau und erneutes
+        Einlesen des Schemas bei jedem Aufruf, und `sqlite3` kann vorbereitete
+        Anweisungen wiederverwenden. In Kindprozessen wird eine neue
+        Verbindung aufgebaut, da SQLite-Verbindungen kein `fork` überstehen.
+        """
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.connection = sqlite3.connect(
+                self.dbfile,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+            local.connection.row_factory = sqlite3.Row
+            local.cursor = local.connection.cursor()
+            local.pid = os.getpid()
+        connection: sqlite3.Connection = local.connection
+        return connection
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        self.db
+        cursor: sqlite3.Cursor = self._local.cursor
+        return cursor
+
+    def open(self) -> sqlite3.Cursor:
+        """Datenbank öffnen, falls nötig, und Cursor zurückgeben"""
+        return self.cursor
+
+    def close(self) -> None:
+        """Verbindung des aktuellen Threads zur Datenbank schließen"""
+        local = self._local
+        if getattr(local, "pid", None) == os.getpid():
+            local.connection.close()
+        local.__dict__.clear()
+
+    def get_create_filmtable_stmt(
+        self, table: Optional[str] = None, if_not_exists: bool = False
+    ) -> str:
+        """SQL-Anweisung zum Erzeugen der Tabelle Filme"""
+        table = self.filmdb if table is None else table
+        maybe_if_not_exists = "IF NOT EXISTS " if if_not_exists else ""
+        return f"""CREATE TABLE {maybe_if_not_exists}{table}
       (Sender text,
       Thema text,
       Titel text,
       Datum date,
-      Zeit text,
-      Dauer integer,
+      Zeit time,
+      Dauer duration,
       Groesse integer,
       Beschreibung text,
       Url text,
@@ -98,14 +231,37 @@ class FilmDB:
       Geo text,
       neu bool,
       _id text primary key )"""
-        )
+
+    @property
+    def fulltextdb(self) -> str:
+        return f"{self.filmdb}_fts"
+
+    def get_create_fulltext_stmt(self, table: Optional[str] = None) -> str:
+        """
+        SQL-Anweisung zum Erzeugen des Volltextindex der Tabelle Filme
+
+        Der Index speichert die Texte nicht selbst, sondern verweist über die
+        `rowid` auf die Tabelle Filme. Auch der Index einer Schattentabelle
+        verweist daher auf `self.filmdb`, denn erst nach dem Tausch werden
+        Inhalte daraus gelesen.
+        """
+        table = self.fulltextdb if table is None else table
+        columns = ", ".join(FULLTEXT_COLUMNS)
+        return f"""CREATE VIRTUAL TABLE {table} USING fts5({columns},
+      content='{self.filmdb}', tokenize='{FULLTEXT_TOKENIZER}')"""
 
     def insert_movies(self, movies: Iterable[MovieListItem]) -> None:
         """
         Filme in Iterable zur Datenbank hinzufügen
 
         Es ist gut möglich, dass `movies` nicht in den Arbeitsspeicher passt.
-        Gerade auf Raspberry-Geräten ist dies der Fall.
+        Gerade auf Raspberry-Geräten ist dies der Fall. Daher werden immer
+        nur `self.batch_size` Filme auf einmal in die Datenbank geschrieben.
+
+        Die Filme werden zunächst in eine Schattentabelle geladen, die erst
+        nach dem Erstellen der Indizes die bisherige Tabelle ersetzt. Bis
+        dahin sehen lesende Zugriffe die vollständige alte Filmliste. Schlägt
+        das Laden fehl, bleibt die bisherige Filmliste erhalten.
 
         Parameters:
         -----------
@@ -120,147 +276,466 @@ class FilmDB:
         Verändert die Datenbank in self.dbfile.
         Ein übergebener Generator wird verbraucht.
         """
-        self.create_filmtable()
+        self.write_rows(self.get_row_batches(movies), UpdateMode.FULL)
+
+    def write_rows(self, row_batches: Iterable[list[FilmRow]], mode: UpdateMode) -> int:
+        """
+        Blöcke von Datenbankzeilen gemäß `mode` in die Filmdatenbank schreiben
+
+        Dies ist die gemeinsame Grundlage von `insert_movies`, `update_movies`
+        und `merge_movies`. Die Zeilen müssen mit `as_row` erzeugt worden sein.
+
+        Returns:
+        --------
+        Anzahl neu aufgenommener Filme. Beim Abgleich fehlen darin die
+        Zeilen, deren Film bereits vorhanden war.
+        """
+        if mode == UpdateMode.FULL:
+            n_inserted = self._load_into_shadow_table(row_batches)
+            self.save_filmtable()
+        elif mode == UpdateMode.INCREMENTAL:
+            n_inserted = self._merge_into_filmtable(row_batches, delete_missing=True)
+            self.save_filmtable()
+        else:
+            n_inserted = self._merge_into_filmtable(row_batches, delete_missing=False)
+            self.save_filmtable(status_key="_akt_diff")
+        return n_inserted
+
+    def _load_into_shadow_table(self, row_batches: Iterable[list[FilmRow]]) -> int:
+        shadow = f"{self.filmdb}_neu"
+        shadow_fts = f"{self.fulltextdb}_neu"
+        INSERT_STMT = f"INSERT INTO {shadow} VALUES (" + 20 * "?," + "?)"
+
+        self.set_bulk_load_pragmas()
+        # Überbleibsel eines abgebrochenen Laufs entfernen
+        self.cursor.execute(f"DROP TABLE IF EXISTS {shadow}")
+        self.cursor.execute(self.get_create_filmtable_stmt(shadow))
+        n_inserted = 0
+        try:
+            for batch in row_batches:
+                self.cursor.executemany(INSERT_STMT, batch)
+                self.commit()
+                n_inserted += len(batch)
+            self.total += n_inserted
+            self.create_indexes(shadow)
+            has_fulltext = self.fill_fulltext_table(shadow_fts, shadow)
+        except BaseException:
+            logger.error("Laden der Filmliste fehlgeschlagen! Behalte alte Filmliste.")
+            self.db.rollback()
+            self.cursor.execute(f"DROP TABLE IF EXISTS {shadow}")
+            self.cursor.execute(f"DROP TABLE IF EXISTS {shadow_fts}")
+            # Verwirft auch die Einstellungen für das Laden
+            self.close()
+            raise
+        self.swap_filmtable(shadow, shadow_fts if has_fulltext else None)
+        return n_inserted
+
+    def swap_filmtable(self, shadow: str, shadow_fts: Optional[str] = None) -> None:
+        """
+        Ersetze die Tabelle Filme atomar durch die Tabelle `shadow`
+
+        Lesende Zugriffe anderer Verbindungen sehen entweder die alte oder
+        die neue Tabelle, aber niemals einen Zwischenstand. Falls angegeben,
+        wird der Volltextindex `shadow_fts` in derselben Transaktion
+        übernommen.
+        """
         self.cursor.execute("BEGIN;")
-        for entry in movies:
-            logger.debug(f"Füge Eintrag zur Filmdatenbank hinzu: {entry}")
-            self.insert_film(entry)
+        self.cursor.execute(f"DROP TABLE IF EXISTS {self.filmdb}")
+        if shadow_fts is not None:
+            self.cursor.execute(f"DROP TABLE IF EXISTS {self.fulltextdb}")
+        self.cursor.execute(f"ALTER TABLE {shadow} RENAME TO {self.filmdb}")
+        if shadow_fts is not None:
+            self.cursor.execute(f"ALTER TABLE {shadow_fts} RENAME TO {self.fulltextdb}")
+        self.commit()
+
+    def fill_fulltext_table(self, fts_table: str, film_table: str) -> bool:
+        """
+        Volltextindex `fts_table` neu erzeugen und aus `film_table` füllen
+
+        Ist FTS5 in der genutzten SQLite-Version nicht verfügbar, wird kein
+        Index erzeugt und die Suche greift auf `LIKE` zurück.
+
+        Returns:
+        --------
+        Ob der Volltextindex erzeugt wurde
+        """
+        columns = ", ".join(FULLTEXT_COLUMNS)
+        try:
+            self.cursor.execute(f"DROP TABLE IF EXISTS {fts_table}")
+            self.cursor.execute(self.get_create_fulltext_stmt(fts_table))
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Volltextindex nicht verfügbar, nutze LIKE-Suche: {e}")
+            return False
+        self.cursor.execute(
+            f"""INSERT INTO {fts_table}(rowid, {columns})
+                SELECT rowid, {columns} FROM {film_table}"""
+        )
+        # Fasst die beim Füllen entstandenen Teilindizes zusammen
+        self.cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES('optimize')")
         self.commit()
-        self.save_filmtable()
+        return True
+
+    def ensure_fulltext_triggers(self) -> None:
+        """
+        Volltextindex bei Änderungen der Tabelle Filme aktuell halten
+
+        Fehlt der Volltextindex, wird er aus der Tabelle Filme erzeugt.
+        """
+        fts = self.fulltextdb
+        if not self.has_fulltext_index():
+            if not self.fill_fulltext_table(fts, self.filmdb):
+                return
+        columns = ", ".join(FULLTEXT_COLUMNS)
+        new_values = ", ".join(f"new.{col}" for col in FULLTEXT_COLUMNS)
+        old_values = ", ".join(f"old.{col}" for col in FULLTEXT_COLUMNS)
+        self.cursor.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_insert
+                AFTER INSERT ON {self.filmdb} BEGIN
+                  INSERT INTO {fts}(rowid, {columns})
+                    VALUES (new.rowid, {new_values});
+                END"""
+        )
+        self.cursor.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_delete
+                AFTER DELETE ON {self.filmdb} BEGIN
+                  INSERT INTO {fts}({fts}, rowid, {columns})
+                    VALUES ('delete', old.rowid, {old_values});
+                END"""
+        )
+        self.cursor.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_update
+                AFTER UPDATE ON {self.filmdb} BEGIN
+                  INSERT INTO {fts}({fts}, rowid, {columns})
+                    VALUES ('delete', old.rowid, {old_values});
+                  INSERT INTO {fts}(rowid, {columns})
+                    VALUES (new.rowid, {new_values});
+                END"""
+        )
+
+    def is_filmtable_current(self, cursor: Optional[sqlite3.Cursor] = None) -> bool:
+        """Prüfen, ob die Tabelle Filme die aktuellen Spaltentypen nutzt"""
+        cursor = self.cursor if cursor is None else cursor
+        column_types = dict(
+            cursor.execute(f"SELECT name, type FROM pragma_table_info('{self.filmdb}')")
+        )
+        return all(
+            column_types.get(column, expected) == expected
+            for column, expected in FILM_COLUMN_TYPES.items()
+        )
+
+    def migrate_filmtable(self) -> None:
+        """
+        Tabelle Filme auf die aktuellen Spaltentypen umstellen
+
+        Die gespeicherten Werte bleiben unverändert, da sich nur die
+        Konvertierung beim Lesen ändert. Die Tabelle wird dazu wie beim
+        vollständigen Laden über eine Schattentabelle ersetzt.
+        """
+        logger.info("Stelle Filmdatenbank auf aktuelles Schema um")
+        shadow = f"{self.filmdb}_neu"
+        shadow_fts = f"{self.fulltextdb}_neu"
+        self.cursor.execute(f"DROP TABLE IF EXISTS {shadow}")
+        self.cursor.execute(self.get_create_filmtable_stmt(shadow))
+        self.cursor.execute(f"INSERT INTO {shadow} SELECT * FROM {self.filmdb}")
+        self.commit()
+        self.create_indexes(shadow)
+        has_fulltext = self.fill_fulltext_table(shadow_fts, shadow)
+        self.swap_filmtable(shadow, shadow_fts if has_fulltext else None)
+
+    def has_fulltext_index(self, cursor: Optional[sqlite3.Cursor] = None) -> bool:
+        """Prüfen, ob der Volltextindex der Tabelle Filme existiert"""
+        cursor = self.cursor if cursor is None else cursor
+        row = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+            (self.fulltextdb,),
+        ).fetchone()
+        return row is not None
+
+    def update_movies(self, movies: Iterable[MovieListItem]) -> None:
+        """
+        Filmdatenbank inkrementell mit Filmen in Iterable abgleichen
+
+        Anders als bei `insert_movies` wird die Tabelle nicht neu erzeugt.
+        Filme, deren ID bereits in der Datenbank ist, werden nur geschrieben,
+        falls sich übrige Angaben wie `neu` oder die Beschreibung geändert
+        haben. Neue Filme werden hinzugefügt und Filme, die in `movies` nicht
+        mehr vorkommen, werden gelöscht.
+
+        Parameters:
+        -----------
+        movies: Lazy Stream von MovieListItem
+
+        Returns:
+        --------
+        None
+
+        Side Effects:
+        -------------
+        Verändert die Datenbank in self.dbfile.
+        Ein übergebener Generator wird verbraucht.
+        """
+        self.write_rows(self.get_row_batches(movies), UpdateMode.INCREMENTAL)
+
+    def merge_movies(self, movies: Iterable[MovieListItem]) -> None:
+        """
+        Filme aus einer Diff-Liste in die Filmdatenbank übernehmen
+
+        Die Diff-Listen von MediathekView enthalten nur neue Einträge. Daher
+        werden, anders als bei `update_movies`, keine Filme gelöscht. Der
+        Zeitstempel der letzten vollständigen Aktualisierung (`_akt`) bleibt
+        unverändert, stattdessen wird `_akt_diff` gesetzt.
+
+        Parameters:
+        -----------
+        movies: Lazy Stream von MovieListItem
+
+        Returns:
+        --------
+        None
+
+        Side Effects:
+        -------------
+        Verändert die Datenbank in self.dbfile.
+        Ein übergebener Generator wird verbraucht.
+        """
+        self.write_rows(self.get_row_batches(movies), UpdateMode.DIFF)
+
+    def _merge_into_filmtable(
+        self, row_batches: Iterable[list[FilmRow]], delete_missing: bool
+    ) -> int:
+        self.set_bulk_load_pragmas()
+        self.cursor.execute(
+            self.get_create_filmtable_stmt(self.filmdb, if_not_exists=True)
+        )
+        if not self.is_filmtable_current():
+            self.migrate_filmtable()
+        self.cursor.execute("CREATE TEMP TABLE aktuelle_ids (_id text primary key)")
+        try:
+            self.ensure_fulltext_triggers()
+            self.cursor.execute("BEGIN;")
+            n_new, n_updated, n_deleted = self._merge_rows(row_batches, delete_missing)
+            self.commit()
+        except BaseException:
+            logger.error(
+                "Abgleich der Filmliste fehlgeschlagen! Behalte alte Filmliste."
+            )
+            self.db.rollback()
+            self.cursor.execute("DROP TABLE IF EXISTS temp.aktuelle_ids")
+            # Verwirft auch die Einstellungen für das Laden
+            self.close()
+            raise
+        self.cursor.execute("DROP TABLE temp.aktuelle_ids")
+        logger.info(
+            f"{n_new} Filme hinzugefügt, {n_updated} Filme aktualisiert,"
+            f" {n_deleted} Filme gelöscht"
+        )
+        return n_new
+
+    def _merge_rows(
+        self, row_batches: Iterable[list[FilmRow]], delete_missing: bool
+    ) -> tuple[int, int, int]:
+        INSERT_STMT = self.get_upsert_stmt()
+        INSERT_ID_STMT = "INSERT OR IGNORE INTO temp.aktuelle_ids VALUES (?)"
+        DEL_STMT = f"""DELETE FROM {self.filmdb}
+                      WHERE _id NOT IN (SELECT _id FROM temp.aktuelle_ids)"""
+
+        n_before = self.cursor.execute(
+            f"SELECT count(*) FROM {self.filmdb}"
+        ).fetchone()[0]
+        n_written = 0
+        for batch in row_batches:
+            # Die ID ist der letzte Eintrag einer Zeile.
+            self.cursor.executemany(INSERT_ID_STMT, (row[-1:] for row in batch))
+            self.cursor.executemany(INSERT_STMT, batch)
+            n_written += self.cursor.rowcount
+        n_deleted = 0
+        if delete_missing:
+            self.cursor.execute(DEL_STMT)
+            n_deleted = self.cursor.rowcount
+        self.total = self.cursor.execute(
+            f"SELECT count(*) FROM {self.filmdb}"
+        ).fetchone()[0]
+        n_new: int = self.total - n_before + n_deleted
+        return n_new, n_written - n_new, n_deleted
+
+    def get_upsert_stmt(self) -> str:
+        """
+        SQL-Anweisung, die einen Film einfügt oder einen geänderten aktualisiert
+
+        Ein Film mit bekannter ID wird nur geschrieben, falls sich eine seiner
+        übrigen Spalten geändert hat. Unveränderte Zeilen bleiben unangetastet
+        und behalten ihre `rowid`.
+        """
+        columns = [
+            name
+            for (name,) in self.cursor.execute(
+                f"SELECT name FROM pragma_table_info('{self.filmdb}')"
+            )
+            if name != "_id"
+        ]
+        assignments = ", ".join(f"{col}=excluded.{col}" for col in columns)
+        old_values = ", ".join(f"{self.filmdb}.{col}" for col in columns)
+        new_values = ", ".join(f"excluded.{col}" for col in columns)
+        return f"""INSERT INTO {self.filmdb} VALUES ({", ".join(21 * "?")})
+                  ON CONFLICT(_id) DO UPDATE SET {assignments}
+                    WHERE ({old_values}) IS NOT ({new_values})"""
 
     def insert_film(self, film: MovieListItem) -> None:
         """Satz zur Datenbank hinzufügen"""
         INSERT_STMT = f"INSERT INTO {self.filmdb} VALUES (" + 20 * "?," + "?)"
-        as_dict = asdict(film)
-        as_dict["_id"] = self.get_film_id(film)
-        as_dict["zeit"] = None if film.zeit is None else film.zeit.strftime("%H:%M")
-        as_dict["dauer"] = film.dauer_as_minutes()
         self.total += 1
-        self.cursor.execute(INSERT_STMT, tuple(as_dict.values()))
+        self.cursor.execute(INSERT_STMT, self.as_row(film))
+
+    def get_row_batches(
+        self, movies: Iterable[MovieListItem]
+    ) -> Iterator[list[FilmRow]]:
+        """Filme in Blöcke von Datenbankzeilen der Größe `self.batch_size` teilen"""
+        movie_iter = iter(movies)
+        while True:
+            batch = [
+                self.as_row(entry) for entry in islice(movie_iter, self.batch_size)
+            ]
+            if not batch:
+                return
+            logger.debug(f"Füge {len(batch)} Einträge zur Filmdatenbank hinzu.")
+            yield batch
+
+    @classmethod
+    def as_row(cls, film: MovieListItem) -> FilmRow:
+        """Film in Zeile der Tabelle Filme umwandeln"""
+        return (
+            film.sender,
+            film.thema,
+            film.titel,
+            film.datum,
+            film.zeit,
+            film.dauer_as_minutes(),
+            film.groesse,
+            film.beschreibung,
+            film.url,
+            film.website,
+            film.url_untertitel,
+            film.url_rtmp,
+            film.url_klein,
+            film.url_rtmp_klein,
+            film.url_hd,
+            film.url_rtmp_hd,
+            film.datuml,
+            film.url_history,
+            film.geo,
+            film.neu,
+            cls.get_film_id(film),
+        )
+
+    def set_bulk_load_pragmas(self) -> None:
+        """
+        Verbindung für das Schreiben vieler Filme konfigurieren
+
+        Abgesehen von `journal_mode` gelten die Einstellungen nur für die
+        aktuelle Verbindung. Dank WAL können andere Prozesse weiterhin lesen.
+        """
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=OFF")
+        self.cursor.execute(f"PRAGMA cache_size=-{BULK_LOAD_CACHE_SIZE_KIB}")
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
 
     def commit(self):
         """Commit durchführen"""
         self.db.commit()
 
-    def save_filmtable(self):
+    def save_filmtable(self, status_key: str = "_akt"):
         """Filme speichern und Index erstellen"""
         self.db.commit()
-        self.cursor.execute(f"CREATE index id_index ON {self.filmdb}(_id)")
-        self.cursor.execute(f"CREATE index sender_index ON {self.filmdb}(sender)")
-        self.cursor.execute(f"CREATE index thema_index ON {self.filmdb}(thema)")
-        self.db.close()
-        self.save_status("_akt")
+        self.create_indexes(self.filmdb)
+        # Verwirft die Einstellungen aus `set_bulk_load_pragmas`
+        self.close()
+        self.save_status(status_key)
         self.save_status("_anzahl", str(self.total))
 
-    def iso_date(self, datum):
-        """Deutsches Datum in ISO-Datum umwandeln"""
-        parts = datum.split(".")
-        return (
-            ("20" if len(parts[2]) == 2 else "")
-            + parts[2]
-            + "-"
-            + parts[1]
-            + "-"
-            + parts[0]
-        )
+    def create_indexes(self, table: str) -> None:
+        """
+        Fehlende Indizes für Filmtabelle `table` erzeugen
 
-    def get_query(self, suche: list[str]) -> str:
-        """Aus Suchbegriff eine SQL-Query erzeugen"""
-
-        if len(suche) == 0:
-            return f"SELECT * FROM {self.filmdb}"
-        if suche[0].lower().startswith("select"):
-            # Suchausdruck ist fertige Query
-            return " ".join(suche)
-
-        where_clause = ""
-        op = ""
-        for token in suche:
-            if token in {"(", "und", "oder", "and", "or", ")"}:
-                if op:
-                    where_clause = where_clause + op
-                op = " %s " % token
+        Indexnamen müssen in der gesamten Datenbank eindeutig sein. Da die
+        Indizes einer Schattentabelle erzeugt werden, solange die bisherige
+        Filmtabelle noch existiert, wechseln sich zwei Namensvarianten ab.
+        """
+        existing = {
+            tuple(row)
+            for row in self.cursor.execute(
+                "SELECT name, tbl_name FROM sqlite_master WHERE type='index'"
+            )
+        }
+        used_names = {name for name, _ in existing}
+        for name, columns in FILM_INDEXES.items():
+            variants = [name, f"{name}_2"]
+            if any((variant, table) in existing for variant in variants):
                 continue
-            if ":" in token:
-                # Suche per Schlüsselwort
-                key, value = token.split(":")
-                if where_clause:
-                    where_clause = where_clause + (op if op else " and ")
-                if key.upper() == "DATUM":
-                    # Sonderbehandlung Datum:
-                    if (">" in value) or ("<" in value) or ("=" in value):
-                        # datum:=xxx, datum:>xxx, datum:>=xxx usw.
-                        if value[1] in ["<", ">", "="]:
-                            date_op = value[0:2]
-                            value = value[2:]
-                        else:
-                            date_op = value[0]
-                            value = value[1:]
-                        where_clause = where_clause + "(%s %s '%s')" % (
-                            key,
-                            date_op,
-                            self.iso_date(value),
-                        )
-                    elif "-" in value:
-                        # datum:start-end
-                        limits = value.split("-")
-                        where_clause = where_clause + (
-                            "(%s >= '%s' and %s <= '%s')"
-                            % (
-                                key,
-                                self.iso_date(limits[0]),
-                                key,
-                                self.iso_date(limits[1]),
-                            )
-                        )
-                    else:
-                        # datum:xxx (identisch zu datum:=xxx)
-                        where_clause = where_clause + "(%s='%s')" % (
-                            key,
-                            self.iso_date(value),
-                        )
-                else:
-                    where_clause = where_clause + "(%s like '%%%s%%')" % (key, value)
-            else:
-                # Volltextsuche
-                if where_clause:
-                    where_clause = where_clause + (op if op else " or ")
-                where_clause = where_clause + (
-                    """(Sender       like '%%%s%%' or
-          Thema        like '%%%s%%' or
-          Titel        like '%%%s%%' or
-          Beschreibung like '%%%s%%')"""
-                    % (token, token, token, token)
-                )
-            op = ""
-
-        # falls noch ein Operator übrig ist:
-        if op:
-            where_clause = where_clause + op
-        logger.debug("SQL-Where: %s" % where_clause)
-        return f"SELECT * FROM {self.filmdb} WHERE {where_clause}"
-
-    def finde_filme(self, criteria: list[str]) -> Iterable[MovieListItem]:
-        """Finde alle Filme, die auf Suchkriterium passen"""
-
-        query = self.get_query(criteria)
-        cursor = self.open()
-        cursor.execute(query)
-        for item in cursor.fetchall():
-            as_dict = {key.lower(): item[key] for key in item.keys()}
-            del as_dict["_id"]
-            if as_dict["zeit"] is not None:
-                as_dict["zeit"] = dt.datetime.strptime(as_dict["zeit"], "%H:%M").time()
+            free_name = next(var for var in variants if var not in used_names)
+            self.cursor.execute(f"CREATE INDEX {free_name} ON {table}({columns})")
+        self.commit()
+
+    def get_query(self, suche: list[str], fulltext: bool = False) -> CompiledQuery:
+        """
+        Aus Suchbegriff eine SQL-Query mit gebundenen Parametern erzeugen
+
+        Mit `fulltext` werden die Volltextsuche und die Suche in Titel,
+        Thema und Beschreibung über den Volltextindex abgewickelt.
+        """
+        fulltext_table = self.fulltextdb if fulltext else None
+        query = compile_query(suche, self.filmdb, fulltext_table)
+        logger.debug(f"SQL-Query: {query.sql} mit Parametern {query.params}")
+        return query
+
+    def finde_filme(
+        self, criteria: list[str], limit: Optional[int] = None, offset: int = 0
+    ) -> Iterator[MovieListItem]:
+        """
+        Finde alle Filme, die auf Suchkriterium passen
+
+        Die Treffer werden in Blöcken von `self.batch_size` Zeilen aus der
+        Datenbank gelesen, sodass auch sehr große Ergebnisse nicht in den
+        Arbeitsspeicher passen müssen. Mit `limit` und `offset` lässt sich
+        ein Ausschnitt der Treffer abfragen. Rohe SQL-Abfragen dürfen die
+        Datenbank nur lesen.
+
+        Die Suche nutzt einen eigenen Cursor, sodass während des Iterierens
+        andere Methoden der Filmdatenbank aufgerufen werden können.
+
+        Raises:
+        -------
+        SuchausdruckFehlerhaft, falls der Suchausdruck ungültig ist. Der
+        Suchausdruck wird sofort geprüft, nicht erst beim Iterieren.
+        """
+        cursor = self.db.cursor()
+        try:
+            fulltext = self.has_fulltext_index(cursor)
+            if self.is_filmtable_current(cursor):
+                cursor.row_factory = film_row_factory
             else:
-                logger.info("Zeit ist None")
-            if as_dict["dauer"] is not None:
-                as_dict["dauer"] = dt.timedelta(minutes=as_dict["dauer"])
+                cursor.row_factory = legacy_film_row_factory
+            query = self.get_query(criteria, fulltext).paginate(limit, offset)
+            if query.is_raw:
+                self._execute_read_only(cursor, query)
             else:
-                logger.info("Dauer ist None")
-            as_dict["neu"] = bool(as_dict["neu"])
-            film = MovieListItem.parse_obj(as_dict)
-            yield film
-        self.close()
+                cursor.execute(query.sql, query.params)
+        except sqlite3.DatabaseError as e:
+            raise SuchausdruckFehlerhaft(f"Abfrage fehlgeschlagen: {e}") from e
+        return self._iter_filme(cursor)
+
+    @staticmethod
+    def _execute_read_only(cursor: sqlite3.Cursor, query: CompiledQuery) -> None:
+        # SQLite prüft die Berechtigungen beim Übersetzen der Anweisung, das
+        # spätere Lesen der Treffer braucht den Authorizer nicht mehr.
+        cursor.connection.set_authorizer(read_only_authorizer)
+        try:
+            cursor.execute(query.sql, query.params)
+        finally:
+            reset_authorizer(cursor.connection)
+
+    def _iter_filme(self, cursor: sqlite3.Cursor) -> Iterator[MovieListItem]:
+        while films := cursor.fetchmany(self.batch_size):
+            yield from films
 
     def save_downloads(self, filme: list[MovieListItem], status=DownloadStatus) -> int:
         """Downloads sichern."""
@@ -288,9 +763,8 @@ class FilmDB:
         # nach save_downloads
 
         cursor.executemany(INSERT_STMT, query_values)
-        changes: int = self.db.total_changes
+        changes: int = cursor.rowcount
         self.commit()
-        self.close()
         return changes
 
     def delete_downloads(self, filme: list[MovieListItem]) -> int:
@@ -300,9 +774,8 @@ class FilmDB:
         cursor = self.open()
         film_id = [(self.get_film_id(cur),) for cur in filme]
         cursor.executemany(DEL_STMT, film_id)
-        n_changes: int = self.db.total_changes
+        n_changes: int = cursor.rowcount
         self.commit()
-        self.close()
         return n_changes
 
     def update_downloads(self, film: MovieListItem, status: DownloadStatus):
@@ -313,7 +786,6 @@ class FilmDB:
             cursor = self.open()
             cursor.execute(UPD_STMT, (status, dt.date.today(), film_id))
             self.commit()
-            self.close()
 
     def read_downloads(
         self, status: list[DownloadStatus] = ["V", "F", "K"]
@@ -333,11 +805,14 @@ class FilmDB:
         except sqlite3.OperationalError as e:
             logger.debug("SQL-Fehler: %s" % e)
             rows = []
-        self.close()
+        if self.is_filmtable_current(cursor):
+            to_film = film_row_factory
+        else:
+            to_film = legacy_film_row_factory
         for row in rows:
             cur_status: DownloadStatus = row["status"]
             datumstatus: dt.date = row["DatumStatus"]
-            yield MovieListItem.from_database_row(row), cur_status, datumstatus
+            yield to_film(cursor, row), cur_status, datumstatus
 
     def save_status(self, key, text=None):
         """Status in Status-Tabelle speichern"""
@@ -358,23 +833,30 @@ class FilmDB:
             self.commit()
             cursor.execute(INSERT_STMT, (key, now, text))
             self.commit()
-            self.close()
 
     def read_status(self, keys):
         """Status aus Status-Tabelle auslesen"""
 
-        SEL_STMT = "SELECT * FROM status WHERE key in %s" % str(tuple(keys))
+        placeholders = ",".join("?" for _ in keys)
+        SEL_STMT = f"SELECT * FROM status WHERE key in ({placeholders})"
         rows = None
         try:
-            with self.lock():
+            with self.lock:
                 cursor = self.open()
-                cursor.execute(SEL_STMT)
+                cursor.execute(SEL_STMT, tuple(keys))
                 rows = cursor.fetchall()
-                self.close()
         except sqlite3.OperationalError as e:
             logger.debug("SQL-Fehler: %s" % e)
         return rows
 
+    def get_status_time(self, key: str) -> Optional[dt.datetime]:
+        """Zeitstempel eines Eintrags der Status-Tabelle auslesen"""
+        rows = self.read_status([key])
+        if not rows:
+            return None
+        zeit: dt.datetime = rows[0]["Zeit"]
+        return zeit
+
     def save_recs(self, id, Dateiname):
         """Aufnahme sichern."""
 
@@ -405,7 +887,6 @@ class FilmDB:
             row = None
 
         if not row:
-            self.close()
             return
         for r in row:
             logger.info("row: %r" % r)
@@ -423,9 +904,8 @@ class FilmDB:
                 self.commit()
         except sqlite3.OperationalError as e:
             logger.debug("SQL-Fehler: %s" % e)
-        self.close()
 
-    def delete_recs(self, rows: list[tuple[Path]]) -> int:
+    def delete_recs(self, rows: list[tuple[str]]) -> int:
         """Aufnahme löschen.
         rows ist Array von Tuplen: [(name,),(name,), ...]"""
         DEL_STMT = "DELETE FROM recordings where Dateiname=?"
@@ -437,9 +917,8 @@ class FilmDB:
 
         cursor = self.open()
         cursor.executemany(DEL_STMT, rows)
-        changes: int = self.db.total_changes
+        changes: int = cursor.rowcount
         self.commit()
-        self.close()
         return changes
 
     def read_recs(self, dateiname: Optional[Path] = None) -> Optional[list[dict]]:
@@ -461,7 +940,6 @@ class FilmDB:
             rows = cursor.fetchall()
         except sqlite3.OperationalError as e:
             logger.debug("SQL-Fehler: %s" % e)
-        self.close()
         return rows
 
     @staticmethod
@@ -0,0 +1,89 @@
+import io
+import json
+
+import pytest
+
+from mtv_cli.content_retrieval import (
+    FilmlistParser,
+    extract_entries_from_filmliste,
+    inherit_sender_thema,
+)
+from mtv_cli.film import MovieListItem
+from mtv_cli.film_filter import RawEntryFilter
+
+
+def make_raw_entry(
+    sender: str, thema: str, titel: str, dauer: str = "00:30:00"
+) -> list[str]:
+    raw_entry = [""] * 20
+    raw_entry[:4] = [sender, thema, titel, "17.10.2026"]
+    raw_entry[5] = dauer
+    raw_entry[19] = "false"
+    return raw_entry
+
+
+def make_filmliste(raw_entries: list[list[str]]) -> io.StringIO:
+    meta = ["17.10.2026, 10:00", "17.10.2026, 08:00", "3", "", ""]
+    header = ["Sender", "Thema", "Titel"]
+    entries = "".join(f',"X":{json.dumps(raw_entry)}' for raw_entry in raw_entries)
+    return io.StringIO(
+        f'{{"Filmliste":{json.dumps(meta)},"Filmliste":{json.dumps(header)}{entries}}}'
+    )
+
+
+# Die kurzen Einträge sind die einzigen, die Sender oder Thema nennen.
+RAW_ENTRIES = [
+    make_raw_entry("ARD", "Tagesschau", "Erste", dauer="00:01:00"),
+    make_raw_entry("", "", "Zweite"),
+    make_raw_entry("", "Sportschau", "Dritte", dauer="00:01:00"),
+    make_raw_entry("", "", "Vierte"),
+    make_raw_entry("ZDF", "heute", "Fünfte", dauer="00:01:00"),
+    make_raw_entry("", "", "Sechste"),
+]
+SHORT_TITLES = {"Erste", "Dritte", "Fünfte"}
+EXPECTED_SENDER_THEMA = {
+    "Erste": ("ARD", "Tagesschau"),
+    "Zweite": ("ARD", "Tagesschau"),
+    "Dritte": ("ARD", "Sportschau"),
+    "Vierte": ("ARD", "Sportschau"),
+    "Fünfte": ("ZDF", "heute"),
+    "Sechste": ("ZDF", "heute"),
+}
+
+
+def test_inherit_sender_thema_fills_empty_fields() -> None:
+    raw_entries = [list(raw_entry) for raw_entry in RAW_ENTRIES]
+    result = {
+        raw_entry[2]: (raw_entry[0], raw_entry[1])
+        for raw_entry in inherit_sender_thema(raw_entries)
+    }
+    assert result == EXPECTED_SENDER_THEMA
+
+
+@pytest.mark.parametrize("parser", list(FilmlistParser))
+def test_extract_entries_inherits_from_prefiltered_entries(
+    parser: FilmlistParser,
+) -> None:
+    prefilter = RawEntryFilter(min_duration=5)
+    films = extract_entries_from_filmliste(
+        make_filmliste(RAW_ENTRIES), parser, prefilter
+    )
+    result = {film.titel: (film.sender, film.thema) for film in films}
+    assert result == {
+        titel: sender_thema
+        for titel, sender_thema in EXPECTED_SENDER_THEMA.items()
+        if titel not in SHORT_TITLES
+    }
+
+
+def test_update_keeps_complete_film() -> None:
+    previous = MovieListItem.from_item_list(make_raw_entry("ARD", "Tagesschau", "A"))
+    film = MovieListItem.from_item_list(make_raw_entry("ZDF", "heute", "B"))
+    assert film.update(previous) is film
+
+
+def test_update_fills_missing_fields() -> None:
+    previous = MovieListItem.from_item_list(make_raw_entry("ARD", "Tagesschau", "A"))
+    film = MovieListItem.from_item_list(make_raw_entry("", "Sportschau", "B"))
+    updated = film.update(previous)
+    assert (updated.sender, updated.thema, updated.titel) == ("ARD", "Sportschau", "B")
@@ -0,0 +1,156 @@
+import gzip
+import http.server
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from mtv_cli.content_retrieval import (
+    LowMemoryFileSystemDownloader,
+    PartialDownload,
+    create_session,
+    get_part_file,
+    get_partial_download_file,
+)
+from mtv_cli.film import MovieQuality
+
+CONTENT = bytes(range(256)) * 1024
+ETAG = '"film-1"'
+
+
+class FilmHandler(http.server.BaseHTTPRequestHandler):
+    """Liefert `CONTENT` unter jedem Pfad, mit Range-Requests"""
+
+    protocol_version = "HTTP/1.1"
+    gzip = False
+    head_status = 200
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def do_HEAD(self) -> None:
+        self.send_response(self.head_status)
+        if self.head_status == 200:
+            self.send_header("ETag", ETAG)
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(CONTENT)))
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        start, stop = 0, len(CONTENT)
+        byte_range = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        is_partial = byte_range is not None and if_range in (None, ETAG)
+        if byte_range is not None and is_partial:
+            first, _, last = byte_range.partition("=")[2].partition("-")
+            start, stop = int(first), int(last) + 1 if last else stop
+        body = CONTENT[start:stop]
+        if self.gzip:
+            body = gzip.compress(body)
+        self.send_response(206 if is_partial else 200)
+        if is_partial:
+            self.send_header(
+                "Content-Range", f"bytes {start}-{stop - 1}/{len(CONTENT)}"
+            )
+        if self.gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("ETag", ETAG)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class GzipFilmHandler(FilmHandler):
+    gzip = True
+
+
+class CutFilmHandler(FilmHandler):
+    """Bricht jede Antwort nach der Hälfte ab"""
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(CONTENT)))
+        self.end_headers()
+        self.wfile.write(CONTENT[: len(CONTENT) // 2])
+        self.close_connection = True
+
+
+def serve(handler: type[FilmHandler]) -> Iterator[str]:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/film.mp4"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def film_url() -> Iterator[str]:
+    yield from serve(FilmHandler)
+
+
+@pytest.fixture
+def gzip_film_url() -> Iterator[str]:
+    yield from serve(GzipFilmHandler)
+
+
+def make_downloader(root: Path, segments: int = 1) -> LowMemoryFileSystemDownloader:
+    return LowMemoryFileSystemDownloader(
+        root=root, quality=MovieQuality.HD, chunk_size=4096, segments=segments
+    )
+
+
+def test_resume_part_file(tmp_path: Path, film_url: str) -> None:
+    part_file = get_part_file(tmp_path / "film.mp4")
+    part_file.write_bytes(CONTENT[:1000])
+    partial = PartialDownload(url=film_url, etag=ETAG, content_length=len(CONTENT))
+    get_partial_download_file(part_file).write_text(partial.json())
+    make_downloader(tmp_path).download_to_part_file(film_url, part_file)
+    assert part_file.read_bytes() == CONTENT
+
+
+def test_encoded_download_is_complete(tmp_path: Path, gzip_film_url: str) -> None:
+    part_file = get_part_file(tmp_path / "film.mp4")
+    make_downloader(tmp_path).download_to_part_file(gzip_film_url, part_file)
+    assert part_file.read_bytes() == CONTENT
+
+
+def test_segmented_download(tmp_path: Path, film_url: str) -> None:
+    part_file = get_part_file(tmp_path / "film.mp4")
+    assert make_downloader(tmp_path, segments=4).download_segmented(film_url, part_file)
+    assert part_file.read_bytes() == CONTENT
+
+
+@pytest.mark.parametrize("head_status", [405, 501])
+def test_segmented_download_without_head(tmp_path: Path, head_status: int) -> None:
+    handler = type("NoHeadHandler", (FilmHandler,), {"head_status": head_status})
+    part_file = get_part_file(tmp_path / "film.mp4")
+    downloader = make_downloader(tmp_path, segments=4)
+    for url in serve(handler):
+        assert not downloader.download_segmented(url, part_file)
+        assert not part_file.exists()
+        downloader.download_to_part_file(url, part_file)
+    assert part_file.read_bytes() == CONTENT
+
+
+def test_cut_download_keeps_part_file(tmp_path: Path) -> None:
+    part_file = get_part_file(tmp_path / "film.mp4")
+    for url in serve(CutFilmHandler):
+        with pytest.raises(requests.RequestException):
+            make_downloader(tmp_path).download_to_part_file(url, part_file)
+    assert part_file.read_bytes() == CONTENT[: len(CONTENT) // 2]
+
+
+def test_session_pools_per_host_and_hosts_separately() -> None:
+    adapter = create_session(pool_size=4, n_hosts=7).get_adapter("https://ard.de")
+    assert isinstance(adapter, HTTPAdapter)
+    # Verbindungen je Server und Anzahl der Server, deren Pools erhalten bleiben
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 4
+    assert adapter.poolmanager.pools._maxsize == 7
@@ -0,0 +1,131 @@
+import datetime as dt
+from typing import Any, Optional
+
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from mtv_cli.film import MovieListItem
+from mtv_cli.film_filter import AgeDurationFilter, RawAgeDurationFilter
+
+TODAY = dt.date(2026, 10, 17)
+FILTER_KWARGS: dict[str, Any] = dict(max_age=30, min_duration=5, today=TODAY)
+
+
+def make_raw_entry(datum: str, dauer: str) -> list[str]:
+    raw_entry = [""] * 20
+    raw_entry[:3] = ["ARD", "Tagesschau", "Titel"]
+    raw_entry[3] = datum
+    raw_entry[5] = dauer
+    raw_entry[19] = "false"
+    return raw_entry
+
+
+def as_datum(date: dt.date) -> str:
+    return f"{date.day:02}.{date.month:02}.{date.year:04}"
+
+
+def as_dauer(duration: dt.timedelta) -> str:
+    minutes, seconds = divmod(int(duration.total_seconds()), 60)
+    return f"{minutes // 60:02}:{minutes % 60:02}:{seconds:02}"
+
+
+def is_film_permitted(raw_entry: list[str], **filter_kwargs: Any) -> Optional[bool]:
+    """Entscheidung von `AgeDurationFilter`, None falls kein Film entsteht"""
+    try:
+        film = MovieListItem.from_item_list(raw_entry)
+    except ValueError:
+        return None
+    return AgeDurationFilter(**filter_kwargs).is_permitted(film)
+
+
+@pytest.mark.parametrize(
+    "datum, dauer, expected",
+    [
+        (as_datum(TODAY - dt.timedelta(days=30)), "00:30:00", True),
+        (as_datum(TODAY - dt.timedelta(days=31)), "00:30:00", False),
+        (as_datum(TODAY), "00:05:00", True),
+        (as_datum(TODAY), "00:04:59", False),
+        # Unbekannte Dauer gilt als 24 Stunden.
+        (as_datum(TODAY), "", True),
+        ("", "00:30:00", False),
+    ],
+)
+def test_raw_filter_agrees_at_boundaries(
+    datum: str, dauer: str, expected: bool
+) -> None:
+    raw_entry = make_raw_entry(datum, dauer)
+    assert RawAgeDurationFilter(**FILTER_KWARGS).is_permitted(raw_entry) is expected
+    assert is_film_permitted(raw_entry, **FILTER_KWARGS) is expected
+
+
+def test_raw_filter_applies_24h_rule_to_max_duration() -> None:
+    raw_entry = make_raw_entry(as_datum(TODAY), "")
+    kwargs = dict(FILTER_KWARGS, max_duration=120)
+    assert not RawAgeDurationFilter(**kwargs).is_permitted(raw_entry)
+    assert is_film_permitted(raw_entry, **kwargs) is False
+
+
+@pytest.mark.parametrize(
+    "datum, dauer",
+    [
+        ("1.5.2017", "00:30:00"),
+        ("2017-05-01", "00:30:00"),
+        ("xx.xx.xxxx", "00:30:00"),
+        (as_datum(TODAY), "0:30"),
+        (as_datum(TODAY), "00-30-00"),
+        (as_datum(TODAY), "aa:bb:cc"),
+    ],
+)
+def test_raw_filter_permits_malformed_entries(datum: str, dauer: str) -> None:
+    raw_entry = make_raw_entry(datum, dauer)
+    assert RawAgeDurationFilter(**FILTER_KWARGS).is_permitted(raw_entry)
+
+
+filter_kwargs = st.fixed_dictionaries(
+    {
+        "min_age": st.none() | st.integers(-10, 60),
+        "max_age": st.none() | st.integers(-10, 60),
+        "min_duration": st.integers(0, 24 * 60),
+        "max_duration": st.none() | st.integers(0, 24 * 60),
+        "today": st.just(TODAY),
+    }
+)
+dates = st.dates(TODAY - dt.timedelta(days=90), TODAY + dt.timedelta(days=30))
+durations = st.timedeltas(dt.timedelta(0), dt.timedelta(hours=23, minutes=59))
+
+
+@given(filter_kwargs, dates.map(as_datum) | st.just(""), durations.map(as_dauer))
+def test_raw_filter_equals_film_filter_on_valid_entries(
+    kwargs: dict[str, Any], datum: str, dauer: str
+) -> None:
+    raw_entry = make_raw_entry(datum, dauer)
+    assert RawAgeDurationFilter(**kwargs).is_permitted(raw_entry) is is_film_permitted(
+        raw_entry, **kwargs
+    )
+
+
+def replace_char(value: str, pos: int, char: str) -> str:
+    return value[:pos] + char + value[pos + 1 :]  # noqa: E203
+
+
+def garbled(valid: st.SearchStrategy[str]) -> st.SearchStrategy[str]:
+    """Gültige Angaben mit einem ersetzten Zeichen, sowie beliebiger Text"""
+    return st.one_of(
+        valid,
+        st.text(max_size=12),
+        st.builds(replace_char, valid, st.integers(0, 9), st.characters()),
+    )
+
+
+@given(
+    filter_kwargs,
+    garbled(dates.map(as_datum)),
+    garbled(durations.map(as_dauer)),
+)
+def test_raw_filter_rejects_only_what_film_filter_rejects(
+    kwargs: dict[str, Any], datum: str, dauer: str
+) -> None:
+    raw_entry = make_raw_entry(datum, dauer)
+    if not RawAgeDurationFilter(**kwargs).is_permitted(raw_entry):
+        assert is_film_permitted(raw_entry, **kwargs) is not True
@@ -0,0 +1,169 @@
+import datetime as dt
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from mtv_cli import content_retrieval
+from mtv_cli.content_retrieval import (
+    BandwidthLimiter,
+    FilmDownloadFehlerhaft,
+    LowMemoryFileSystemDownloader,
+)
+from mtv_cli.film import MovieListItem, MovieQuality
+from mtv_cli.parallel_download import download_parallel
+
+
+def make_film(titel: str, host: str = "ard.example") -> MovieListItem:
+    return MovieListItem(
+        sender="ARD",
+        thema="Thema",
+        titel=titel,
+        datum=dt.date(2022, 1, 1),
+        zeit=dt.time(20, 15),
+        dauer=dt.timedelta(minutes=90),
+        groesse=100,
+        beschreibung="",
+        url=f"https://{host}/{titel}.mp4",
+        website="",
+        url_untertitel="",
+        url_rtmp="",
+        url_klein="",
+        url_rtmp_klein="",
+        url_hd="",
+        url_rtmp_hd="",
+        datuml=0,
+        url_history="",
+        geo="",
+        neu=False,
+    )
+
+
+class StubDownloads:
+    """Ersetzt `download_film` und zählt gleichzeitig laufende Downloads"""
+
+    def __init__(self, duration_s: float = 0.02) -> None:
+        self.duration_s = duration_s
+        self.errors: dict[str, Exception] = {}
+        self.started: list[str] = []
+        self.running: Counter[str] = Counter()
+        self.max_running = 0
+        self.max_per_host: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def download_film(self, film: MovieListItem) -> None:
+        host = film.url.split("/")[2]
+        with self._lock:
+            self.started.append(film.titel)
+            self.running[host] += 1
+            self.max_running = max(self.max_running, sum(self.running.values()))
+            self.max_per_host[host] = max(self.max_per_host[host], self.running[host])
+        try:
+            time.sleep(self.duration_s)
+            if film.titel in self.errors:
+                raise self.errors[film.titel]
+        finally:
+            with self._lock:
+                self.running[host] -= 1
+
+
+@pytest.fixture
+def stub(monkeypatch: pytest.MonkeyPatch) -> StubDownloads:
+    stub = StubDownloads()
+    monkeypatch.setattr(
+        LowMemoryFileSystemDownloader,
+        "download_film",
+        lambda _, film: stub.download_film(film),
+    )
+    return stub
+
+
+@pytest.fixture
+def retriever(tmp_path: Path) -> LowMemoryFileSystemDownloader:
+    return LowMemoryFileSystemDownloader(root=tmp_path, quality=MovieQuality.SD)
+
+
+def test_limits_are_never_exceeded(
+    stub: StubDownloads, retriever: LowMemoryFileSystemDownloader
+) -> None:
+    filme = [make_film(f"ARD {i}") for i in range(6)]
+    filme += [make_film(f"ZDF {i}", host="zdf.example") for i in range(6)]
+    filme += [make_film(f"ARTE {i}", host="arte.example") for i in range(2)]
+    results = list(download_parallel(retriever, filme, n_transfers=4, max_per_host=2))
+    assert sorted(film.titel for film, _ in results) == sorted(f.titel for f in filme)
+    assert all(is_success for _, is_success in results)
+    assert stub.max_running <= 4
+    assert max(stub.max_per_host.values()) <= 2
+
+
+def test_failed_download_does_not_stop_others(
+    stub: StubDownloads, retriever: LowMemoryFileSystemDownloader
+) -> None:
+    stub.errors["B"] = FilmDownloadFehlerhaft()
+    filme = [make_film(titel) for titel in "ABC"]
+    results = list(download_parallel(retriever, filme, n_transfers=1))
+    assert [(film.titel, is_success) for film, is_success in results] == [
+        ("A", True),
+        ("B", False),
+        ("C", True),
+    ]
+
+
+def test_unexpected_error_stops_new_downloads(
+    stub: StubDownloads, retriever: LowMemoryFileSystemDownloader
+) -> None:
+    # "A" bricht ab, während "B" noch läuft; "C" wird nicht mehr begonnen.
+    stub.errors["A"] = OSError("Platte voll")
+    b_started = threading.Event()
+    download_film = stub.download_film
+
+    def download_film_slowly(film: MovieListItem) -> None:
+        if film.titel == "A":
+            b_started.wait()
+        else:
+            b_started.set()
+            time.sleep(0.2)
+        download_film(film)
+
+    stub.download_film = download_film_slowly  # type: ignore[method-assign]
+    filme = [make_film("A"), make_film("B", host="zdf.example"), make_film("C")]
+    results: list[tuple[str, bool]] = []
+    with pytest.raises(OSError, match="Platte voll"):
+        for film, is_success in download_parallel(retriever, filme, n_transfers=2):
+            results.append((film.titel, is_success))
+    assert results == [("B", True)]
+    assert stub.started == ["A", "B"]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_bandwidth_limiter_waits_for_missing_tokens(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    clock = FakeClock()
+    monkeypatch.setattr(content_retrieval.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(content_retrieval.time, "sleep", clock.sleep)
+    limiter = BandwidthLimiter(bytes_per_second=1000)
+    # Der Vorrat einer Sekunde wird sofort freigegeben, danach n / rate gewartet.
+    limiter.consume(1000)
+    assert clock.sleeps == []
+    limiter.consume(500)
+    assert clock.sleeps == [pytest.approx(0.5)]
+    # Nach einer Pause ist der Vorrat wieder aufgefüllt, aber nicht darüber hinaus.
+    clock.now += 10
+    limiter.consume(1000)
+    limiter.consume(250)
+    assert clock.sleeps == [pytest.approx(0.5), pytest.approx(0.25)]
@@ -0,0 +1,94 @@
+import datetime as dt
+import io
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from mtv_cli.content_retrieval import FilmlistParser, extract_entries_from_filmliste
+from mtv_cli.film import MovieListItem
+from mtv_cli.film_filter import AgeDurationFilter, FilmFilter, RawAgeDurationFilter
+from mtv_cli.parallel_ingest import ParallelIngestFehlerhaft, ingest_parallel
+from mtv_cli.storage_backend import FilmDB, UpdateMode
+
+PREFILTER = RawAgeDurationFilter(max_age=30, min_duration=5)
+FILM_FILTER = AgeDurationFilter(max_age=30, min_duration=5)
+
+
+def make_raw_entry(n: int) -> list[str]:
+    datum = dt.date.today() - dt.timedelta(days=n)
+    raw_entry = [""] * 20
+    raw_entry[:6] = [
+        "ARD",
+        "Doku",
+        f"Film {n}",
+        datum.strftime("%d.%m.%Y"),
+        "20:15:00",
+        f"00:{n:02}:00",
+    ]
+    raw_entry[8] = f"https://ard.example/{n}.mp4"
+    raw_entry[19] = "false"
+    return raw_entry
+
+
+def make_filmliste() -> io.StringIO:
+    # Die Filme 0 bis 4 sind zu kurz, die Filme 31 bis 39 zu alt.
+    meta = ["17.10.2026, 10:00", "17.10.2026, 08:00", "3", "", ""]
+    header = ["Sender", "Thema", "Titel"]
+    entries = "".join(f',"X":{json.dumps(make_raw_entry(n))}' for n in range(40))
+    return io.StringIO(
+        f'{{"Filmliste":{json.dumps(meta)},"Filmliste":{json.dumps(header)}{entries}}}'
+    )
+
+
+def insert_serially(dbfile: Path) -> None:
+    with FilmDB(dbfile) as filmDB:
+        filmDB.insert_movies(
+            extract_entries_from_filmliste(
+                make_filmliste(), FilmlistParser.EVENTS, PREFILTER, FILM_FILTER
+            )
+        )
+
+
+def ingest(dbfile: Path, film_filter: FilmFilter) -> None:
+    with FilmDB(dbfile, batch_size=4) as filmDB:
+        ingest_parallel(
+            make_filmliste(),
+            FilmlistParser.EVENTS,
+            PREFILTER,
+            film_filter,
+            filmDB,
+            UpdateMode.FULL,
+            n_workers=2,
+        )
+
+
+def read_rows(dbfile: Path) -> set[tuple[object, ...]]:
+    db = sqlite3.connect(dbfile)
+    try:
+        return set(db.execute("SELECT * FROM filme"))
+    finally:
+        db.close()
+
+
+def test_parallel_ingest_equals_insert_movies(tmp_path: Path) -> None:
+    insert_serially(tmp_path / "seriell.sqlite")
+    ingest(tmp_path / "parallel.sqlite", FILM_FILTER)
+    expected = read_rows(tmp_path / "seriell.sqlite")
+    assert len(expected) == 26
+    assert read_rows(tmp_path / "parallel.sqlite") == expected
+
+
+class FailingFilter:
+    def is_permitted(self, film: MovieListItem) -> bool:
+        raise RuntimeError("Filter defekt")
+
+
+def test_failed_worker_keeps_filmtable(tmp_path: Path) -> None:
+    dbfile = tmp_path / "filme.sqlite"
+    insert_serially(dbfile)
+    expected = read_rows(dbfile)
+    with pytest.raises(ParallelIngestFehlerhaft, match="mtv-cli-umwandlung"):
+        ingest(dbfile, FailingFilter())
+    assert read_rows(dbfile) == expected
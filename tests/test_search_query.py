@@ -0,0 +1,126 @@
+import re
+import sqlite3
+from typing import Iterator
+
+import pytest
+
+from mtv_cli.search_query import SuchausdruckFehlerhaft, compile_query, compile_where
+
+FILME = [
+    # Titel, Sender, Thema, Beschreibung, Datum
+    ("Alpha", "ARD", "Tagesschau", "Nachrichten", "2017-04-30"),
+    ("Beta", "ARD", "Sportschau", "Fußball", "2017-05-01"),
+    ("Gamma", "ZDF", "heute", "Nachrichten", "2017-05-02"),
+    ("Delta", "ZDFinfo", "Doku", "Geschichte", "2017-05-03"),
+    ("100% Natur", "ARTE.DE", "Doku", "Wald", "2017-05-04"),
+    ("100 Jahre", "ARTE.DE", "Doku", "Geschichte", "2017-05-05"),
+    ("a_b", "SWR", "Doku", "Unterstrich", "2017-05-06"),
+    ("axb", "SWR", "Doku", "Buchstabe", "2017-05-07"),
+    ("C:\\Pfad", "SWR", "Doku", "Rückstrich", "2017-05-08"),
+    ("Pfadfinder", "SWR", "Doku", "Ohne Datum", None),
+]
+
+
+@pytest.fixture
+def db() -> Iterator[sqlite3.Connection]:
+    db = sqlite3.connect(":memory:")
+    db.execute(
+        "CREATE TABLE filme"
+        " (Titel text, Sender text, Thema text, Beschreibung text, Datum date)"
+    )
+    db.executemany("INSERT INTO filme VALUES (?, ?, ?, ?, ?)", FILME)
+    yield db
+    db.close()
+
+
+def find(db: sqlite3.Connection, *suche: str) -> set[str]:
+    query = compile_query(list(suche), "filme")
+    return {row[0] for row in db.execute(query.sql, query.params)}
+
+
+def test_und_binds_stronger_than_oder(db: sqlite3.Connection) -> None:
+    # Entspricht "Alpha oder (Sportschau und Fußball)", nicht
+    # "(Alpha oder Sportschau) und Fußball".
+    assert find(db, "Alpha", "oder", "Sportschau", "und", "Fußball") == {
+        "Alpha",
+        "Beta",
+    }
+    assert find(db, "(", "Alpha", "oder", "Sportschau", ")", "und", "Fußball") == {
+        "Beta"
+    }
+
+
+def test_implicit_or_before_free_text(db: sqlite3.Connection) -> None:
+    assert find(db, "Alpha", "Gamma") == {"Alpha", "Gamma"}
+
+
+def test_implicit_and_before_fields_and_groups(db: sqlite3.Connection) -> None:
+    assert find(db, "Nachrichten", "sender:ZDF") == {"Gamma"}
+    assert find(db, "Nachrichten", "(", "sender:ARD", ")") == {"Alpha"}
+
+
+@pytest.mark.parametrize(
+    "datum, expected",
+    [
+        ("datum:1.5.17", {"Beta"}),
+        ("datum:01.05.2017", {"Beta"}),
+        ("datum:<2.5.17", {"Alpha", "Beta"}),
+        ("datum:<=2.5.17", {"Alpha", "Beta", "Gamma"}),
+        ("datum:>7.5.17", {"C:\\Pfad"}),
+        ("datum:>=7.5.17", {"axb", "C:\\Pfad"}),
+        ("datum:=30.4.17", {"Alpha"}),
+        ("datum:1.5.17-3.5.2017", {"Beta", "Gamma", "Delta"}),
+    ],
+)
+def test_datum(db: sqlite3.Connection, datum: str, expected: set[str]) -> None:
+    assert find(db, datum) == expected
+
+
+def test_datum_is_zero_padded() -> None:
+    assert compile_query(["datum:1.5.17"], "filme").params == ("2017-05-01",)
+
+
+@pytest.mark.parametrize(
+    "suche, expected",
+    [
+        ("100%", {"100% Natur"}),
+        ("a_b", {"a_b"}),
+        ("\\Pfad", {"C:\\Pfad"}),
+    ],
+)
+def test_like_wildcards_are_escaped(
+    db: sqlite3.Connection, suche: str, expected: set[str]
+) -> None:
+    assert find(db, suche) == expected
+
+
+def test_exact_field_match(db: sqlite3.Connection) -> None:
+    assert find(db, "sender:=zdf") == {"Gamma"}
+    assert find(db, "sender:zdf") == {"Gamma", "Delta"}
+
+
+@pytest.mark.parametrize(
+    "suche, message",
+    [
+        (["sendung:x"], "Unbekanntes Suchfeld: sendung"),
+        (["datum:1.5"], "Ungültiges Datum: 1.5"),
+        (["datum:1.Mai.17"], "Ungültiges Datum: 1.Mai.17"),
+        (["(", "Alpha"], "Schließende Klammer fehlt"),
+        (["Alpha", ")"], "Unerwartetes ')' im Suchausdruck"),
+        (["Alpha", "oder"], "Suchausdruck endet unerwartet"),
+        (["und", "Alpha"], "Unerwartetes 'und' im Suchausdruck"),
+        (["Alpha", "and", "or", "Beta"], "Unerwartetes 'or' im Suchausdruck"),
+    ],
+)
+def test_invalid_search(suche: list[str], message: str) -> None:
+    with pytest.raises(SuchausdruckFehlerhaft, match=f"^{re.escape(message)}$"):
+        compile_query(suche, "filme")
+
+
+def test_same_shape_gives_same_sql() -> None:
+    compile_where.cache_clear()
+    first = compile_query(["Alpha", "sender:ARD", "datum:1.5.17"], "filme")
+    second = compile_query(["Beta", "sender:ZDF", "datum:2.5.17"], "filme")
+    assert first.sql == second.sql
+    assert first.params != second.params
+    assert compile_where.cache_info().hits == 1
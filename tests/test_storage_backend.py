@@ -0,0 +1,157 @@
+import datetime as dt
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from mtv_cli.film import MovieListItem
+from mtv_cli.search_query import SuchausdruckFehlerhaft
+from mtv_cli.storage_backend import FilmDB
+
+
+def make_film(titel: str, sender: str = "ARD") -> MovieListItem:
+    return MovieListItem(
+        sender=sender,
+        thema="Thema",
+        titel=titel,
+        datum=dt.date(2022, 1, 1),
+        zeit=dt.time(20, 15),
+        dauer=dt.timedelta(minutes=90),
+        groesse=100,
+        beschreibung=f"Beschreibung von {titel}",
+        url=f"https://example.org/{titel}.mp4",
+        website="",
+        url_untertitel="",
+        url_rtmp="",
+        url_klein="",
+        url_rtmp_klein="",
+        url_hd="",
+        url_rtmp_hd="",
+        datuml=0,
+        url_history="",
+        geo="",
+        neu=False,
+    )
+
+
+@pytest.fixture
+def film_db(tmp_path: Path) -> Iterator[FilmDB]:
+    # Blöcke aus einzelnen Filmen, damit Fehler mitten im Schreiben auftreten
+    with FilmDB(tmp_path / "filme.sqlite", batch_size=1) as filmDB:
+        filmDB.insert_movies([make_film("A"), make_film("B")])
+        yield filmDB
+
+
+def get_titles(filmDB: FilmDB) -> set[str]:
+    return {row[0] for row in filmDB.cursor.execute("SELECT titel FROM filme")}
+
+
+def test_failed_merge_keeps_films_and_allows_next_merge(film_db: FilmDB) -> None:
+    def failing_movies() -> Iterator[MovieListItem]:
+        yield make_film("C")
+        yield make_film("D")
+        raise RuntimeError("Filmliste abgebrochen")
+
+    with pytest.raises(RuntimeError):
+        film_db.update_movies(failing_movies())
+    assert get_titles(film_db) == {"A", "B"}
+
+    film_db.update_movies([make_film("A"), make_film("C")])
+    assert get_titles(film_db) == {"A", "C"}
+
+
+@pytest.mark.parametrize(
+    "criteria", [["titel:A"], ["select * from filme where titel = 'A'"]]
+)
+def test_write_after_search(film_db: FilmDB, criteria: list[str]) -> None:
+    films = list(film_db.finde_filme(criteria))
+    assert [film.titel for film in films] == ["A"]
+
+    film_db.save_downloads(films, status="V")
+    assert [film.titel for film, _, _ in film_db.read_downloads()] == ["A"]
+
+
+def test_raw_fulltext_search(tmp_path: Path) -> None:
+    dbfile = tmp_path / "filme.sqlite"
+    with FilmDB(dbfile) as filmDB:
+        filmDB.insert_movies([make_film("Ärzte"), make_film("Anwälte")])
+    # Eine neue Verbindung muss den Volltextindex erst einrichten.
+    with FilmDB(dbfile) as filmDB:
+        criteria = [
+            "select * from filme where rowid in"
+            " (select rowid from filme_fts where filme_fts match 'arzte')"
+        ]
+        assert [film.titel for film in filmDB.finde_filme(criteria)] == ["Ärzte"]
+
+
+def test_raw_search_cannot_write(film_db: FilmDB) -> None:
+    with pytest.raises(SuchausdruckFehlerhaft):
+        film_db.finde_filme(["select * from filme where load_extension('x')"])
+
+
+def test_download_changes_count_only_the_call(film_db: FilmDB) -> None:
+    films = [make_film("A"), make_film("B")]
+    assert film_db.save_downloads(films, status="V") == 2
+    assert film_db.save_downloads(films, status="V") == 0
+    assert film_db.delete_downloads(films[:1]) == 1
+    assert film_db.delete_downloads(films[:1]) == 0
+
+
+def test_recording_changes_count_only_the_call(film_db: FilmDB) -> None:
+    for film in make_film("A"), make_film("B"):
+        film_db.save_recs(FilmDB.get_film_id(film), f"{film.titel}.mp4")
+    assert film_db.delete_recs([("A.mp4",)]) == 1
+    assert film_db.delete_recs([("A.mp4",)]) == 0
+
+
+def test_read_downloads_from_legacy_filmtable(tmp_path: Path) -> None:
+    with FilmDB(tmp_path / "filme.sqlite") as filmDB:
+        filmDB.insert_movies([make_film("A")])
+        # Tabelle mit den Spaltentypen älterer Versionen, Werte bleiben gleich
+        legacy_stmt = filmDB.get_create_filmtable_stmt("filme_alt")
+        legacy_stmt = legacy_stmt.replace("Zeit time", "Zeit text")
+        legacy_stmt = legacy_stmt.replace("Dauer duration", "Dauer integer")
+        filmDB.cursor.execute(legacy_stmt)
+        filmDB.cursor.execute("INSERT INTO filme_alt SELECT * FROM filme")
+        filmDB.cursor.execute("DROP TABLE filme")
+        filmDB.cursor.execute("ALTER TABLE filme_alt RENAME TO filme")
+        assert not filmDB.is_filmtable_current()
+
+        filmDB.save_downloads([make_film("A")], status="V")
+        [(film, status, _)] = filmDB.read_downloads()
+        assert (film.zeit, film.dauer, status) == (
+            dt.time(20, 15),
+            dt.timedelta(minutes=90),
+            "V",
+        )
+
+
+def test_merge_inserts_deletes_and_updates_changed_films(tmp_path: Path) -> None:
+    with FilmDB(tmp_path / "filme.sqlite") as filmDB:
+        filmDB.insert_movies([make_film("A"), make_film("B"), make_film("D")])
+        cursor = filmDB.cursor
+        rowids_before = dict(cursor.execute("SELECT titel, rowid FROM filme"))
+        # Hält fest, welche Zeilen beim Abgleich geschrieben werden
+        cursor.execute("CREATE TABLE geschrieben (titel text)")
+        cursor.execute(
+            """CREATE TRIGGER protokoll AFTER UPDATE ON filme BEGIN
+                 INSERT INTO geschrieben VALUES (new.titel);
+               END"""
+        )
+
+        changed = replace(make_film("B"), neu=True, beschreibung="Wiederholung")
+        filmDB.update_movies([make_film("A"), changed, make_film("C")])
+
+        # Der Abgleich schließt die Verbindung.
+        cursor = filmDB.cursor
+        rowids_after = dict(cursor.execute("SELECT titel, rowid FROM filme"))
+        assert set(rowids_after) == {"A", "B", "C"}
+        assert rowids_after["A"] == rowids_before["A"]
+        assert rowids_after["B"] == rowids_before["B"]
+        assert [row[0] for row in cursor.execute("SELECT * FROM geschrieben")] == ["B"]
+        [film] = filmDB.finde_filme(["beschreibung:Wiederholung"])
+        assert (film.titel, film.neu) == ("B", True)
+        cursor.execute(
+            "INSERT INTO filme_fts(filme_fts, rank) VALUES('integrity-check', 1)"
+        )